@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+''' Training step time and peak memory of the DGCNN family versus the number of points for
+each Params.activation_checkpoint setting. Before timing, each setting is checked to leave
+the same BatchNorm running statistics after a training step as the step without checkpointing.
+
+    python -m benchmark.activation_checkpoint --num_points 1024 2048 4096 --batch_size 32
+'''
+
+import argparse
+import torch
+
+from benchmark.common import isolated
+from benchmark.common import peak_rss_mb
+from utils.models import MODELS
+from utils.params import Params
+from utils.utility import calculate_loss
+from utils.utility import measure
+
+SETTINGS = ['none', 'edge_conv', 'all']
+
+def training_step(name, setting, batch_size, num_points):
+    ''' A train mode model of the setting and a function running one SGD step on a fixed batch. '''
+    torch.manual_seed(42)
+    params = Params(model=MODELS[name], device='cpu', num_points=num_points, activation_checkpoint=setting, dump_file=False)
+    model = params.model(params).train()
+    opt = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+    data = torch.rand(batch_size, 3, num_points)
+    label = torch.randint(params.number_classes, (batch_size,))
+
+    def step():
+        opt.zero_grad()
+        loss = calculate_loss(model(data), label)
+        loss.backward()
+        opt.step()
+    return model, step
+
+def check_batch_norm_stats(name, setting, batch_size=4, num_points=256):
+    ''' Largest difference of the BatchNorm buffers after one step with and without checkpointing. '''
+    buffers = []
+    for candidate in ('none', setting):
+        model, step = training_step(name, candidate, batch_size, num_points)
+        torch.manual_seed(0)
+        step()
+        buffers.append({key: value.double() for key, value in model.state_dict().items()
+                        if key.endswith(('running_mean', 'running_var', 'num_batches_tracked'))})
+    return max((buffers[0][key] - buffers[1][key]).abs().max().item() for key in buffers[0])
+
+def run(name, setting, batch_size, num_points, repeat):
+    _, step = training_step(name, setting, batch_size, num_points)
+
+    rss_before = peak_rss_mb()
+    step_time = measure(step, repeat)
+    return step_time, peak_rss_mb() - rss_before
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=['DGCNN', 'AttentionDGCNN'], choices=['DGCNN', 'AttentionDGCNN'])
+    parser.add_argument('--settings', nargs='+', default=SETTINGS, choices=SETTINGS)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[1024, 2048, 4096])
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name in args.models:
+        for setting in args.settings:
+            if setting == 'none' or (name == 'DGCNN' and setting == 'all'):
+                continue
+            error = check_batch_norm_stats(name, setting)
+            if error > 1e-5:
+                raise SystemExit('%s with activation_checkpoint=%s changes the BatchNorm statistics by %.2e' % (name, setting, error))
+            print('%-15s checkpoint: %-9s BatchNorm statistics match the step without checkpointing' % (name, setting))
+
+    for name in args.models:
+        for num_points in args.num_points:
+            for setting in args.settings:
+                if name == 'DGCNN' and setting == 'all':
+                    continue
+                step_time, memory = isolated(run, name, setting, args.batch_size, num_points, args.repeat)
+                print('%-15s checkpoint: %-9s B: %d, N: %5d, step: %.3f s, train rss: %.1f MB' %
+                      (name, setting, args.batch_size, num_points, step_time, memory))
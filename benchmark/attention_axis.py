@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+''' Latency of one attention block (64 channels) as the number of points N and the batch
+size B grow, for each Params.attention_axis and attention_impl. With axis='batch' the
+cost follows B^2, with axis='points' it follows N^2 per cloud.
+
+    python -m benchmark.attention_axis --num_points 256 512 1024 2048 --batch_size 1 8 32
+'''
+
+import argparse
+import torch
+import torch.nn as nn
+
+from utils.attention import self_attention
+from utils.utility import measure
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[256, 512, 1024, 2048])
+    parser.add_argument('--batch_size', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--channels', type=int, default=64)
+    parser.add_argument('--heads', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+    att = nn.MultiheadAttention(args.channels, args.heads).eval()
+    with torch.no_grad():
+        for axis in ['batch', 'points']:
+            for impl in ['native', 'fused']:
+                for batch_size in args.batch_size:
+                    for num_points in args.num_points:
+                        x = torch.rand(batch_size, args.channels, num_points)
+                        latency = measure(lambda: self_attention(att, x, impl=impl, axis=axis), args.repeat)
+                        print('axis: %-6s impl: %-6s B: %3d, N: %5d, latency: %.6f s, per cloud: %.6f s' %
+                              (axis, impl, batch_size, num_points, latency, latency / batch_size))
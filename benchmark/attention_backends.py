@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+''' PointAttentionNet forward latency and peak memory versus the number of points for each
+attention backend (Params.attention_impl, attending over the points of each cloud), and
+ModelNet40 test accuracy of checkpoints trained with each backend.
+
+    python -m benchmark.attention_backends --num_points 1024 4096 16384 32768
+    python -m benchmark.attention_backends --checkpoint linear=path/to/best_model.t7 --checkpoint inducing=path/to/best_model.t7
+'''
+
+import argparse
+import torch
+
+from benchmark.common import forward_latency
+from benchmark.common import isolated
+from benchmark.common import peak_rss_mb
+from model.point_attention_net import PointAttentionNet
+from utils.params import Params
+
+BACKENDS = ['native', 'fused', 'linear', 'inducing']
+QUADRATIC = ['native', 'fused']
+
+def run(impl, batch_size, num_points, inducing_points, repeat):
+    torch.manual_seed(42)
+    params = Params(model=PointAttentionNet, device='cpu', num_points=num_points, attention_impl=impl,
+                    attention_axis='points', inducing_points=inducing_points, dump_file=False)
+    model = params.model(params)
+    rss_before = peak_rss_mb()
+    latency = forward_latency(model, batch_size, num_points, repeat)
+    return latency, peak_rss_mb() - rss_before
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=BACKENDS, choices=BACKENDS)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[1024, 2048, 4096, 8192, 16384, 32768])
+    parser.add_argument('--batch_size', type=int, default=1)
+    parser.add_argument('--inducing_points', type=int, default=32)
+    parser.add_argument('--max_quadratic_points', type=int, default=8192, help='Skip the O(N^2) backends above this many points')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--checkpoint', action='append', default=[], help='IMPL=PATH of a checkpoint trained with that backend')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    for impl in args.backends:
+        for num_points in args.num_points:
+            if impl in QUADRATIC and num_points > args.max_quadratic_points:
+                continue
+            latency, memory = isolated(run, impl, args.batch_size, num_points, args.inducing_points, args.repeat)
+            print('impl: %-8s B: %d, N: %6d, latency: %.6f s, forward rss: %.1f MB' % (impl, args.batch_size, num_points, latency, memory))
+
+    if args.checkpoint:
+        from main import test
+
+        for checkpoint in args.checkpoint:
+            impl, path = checkpoint.split('=', 1)
+            params = Params(model=PointAttentionNet, device=args.device, attention_impl=impl, attention_axis='points',
+                            inducing_points=args.inducing_points, dump_file=False)
+            test_acc, avg_per_class_acc = test(params, state_dict=path)
+            print('impl: %-8s test acc: %.6f, test avg acc: %.6f' % (impl, test_acc, avg_per_class_acc))
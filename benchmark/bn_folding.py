@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+''' Eval mode CPU latency of each model before and after utils.bn_folding.optimize_for_inference
+at batch sizes 1 and 32, with the largest logit difference between the two. Without a
+checkpoint the models are randomly initialized and their BatchNorm statistics are
+accumulated on a few random batches, so the folding is not trivial.
+
+    python -m benchmark.bn_folding
+    python -m benchmark.bn_folding --checkpoint DGCNN=path/to/best_model.t7
+'''
+
+import argparse
+import torch
+
+from benchmark.common import forward_latency
+from utils.bn_folding import optimize_for_inference
+from utils.models import MODELS
+from utils.params import Params
+from utils.utility import load_checkpoint
+
+def build(name, num_points, checkpoints):
+    params = Params(model=MODELS[name], device='cpu', num_points=num_points, dump_file=False)
+    model = params.model(params)
+    if name in checkpoints:
+        model.load_state_dict(load_checkpoint(checkpoints[name]))
+    else:
+        model.train()
+        with torch.no_grad():
+            for _ in range(3):
+                model(torch.rand(8, 3, num_points))
+    return model.eval()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=list(MODELS.keys()), choices=MODELS.keys())
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 32])
+    parser.add_argument('--num_points', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--checkpoint', action='append', default=[], help='MODEL=PATH of a trained checkpoint')
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+    checkpoints = dict(checkpoint.split('=', 1) for checkpoint in args.checkpoint)
+    for name in args.models:
+        model = build(name, args.num_points, checkpoints)
+        folded = optimize_for_inference(model)
+
+        x = torch.rand(4, 3, args.num_points)
+        with torch.no_grad():
+            error = (model(x) - folded(x)).abs().max().item()
+
+        for batch_size in args.batch_sizes:
+            latency = forward_latency(model, batch_size, args.num_points, args.repeat)
+            folded_latency = forward_latency(folded, batch_size, args.num_points, args.repeat)
+            print('%-17s B: %2d, latency: %.6f s, folded: %.6f s, reduction: %5.1f%%, max logit error: %.2e' %
+                  (name, batch_size, latency, folded_latency, 100*(1 - folded_latency/latency), error))
@@ -0,0 +1,46 @@
+import sys
+import resource
+import multiprocessing
+import torch
+
+from utils.utility import autocast
+from utils.utility import calculate_loss
+from utils.utility import measure
+
+def forward_latency(model, batch_size, num_points, repeat=5):
+    ''' Average eval mode forward time of model on a random [batch_size, 3, num_points] cloud. '''
+    x = torch.rand(batch_size, 3, num_points)
+    model.eval()
+    with torch.no_grad():
+        return measure(lambda: model(x), repeat)
+
+def throughput(model, data, label, repeat=5):
+    ''' Clouds per second of the eval forward pass and of a training step, under the autocast of model.args.precision. '''
+    opt = torch.optim.SGD(model.parameters(), lr=0.01, momentum=0.9)
+
+    def forward():
+        with torch.no_grad(), autocast(model.args):
+            model(data)
+
+    def step():
+        opt.zero_grad()
+        with autocast(model.args):
+            logits = model(data)
+        calculate_loss(logits.float(), label).backward()
+        opt.step()
+
+    model.eval()
+    forward_time = measure(forward, repeat)
+    model.train()
+    step_time = measure(step, repeat)
+    return data.size(0) / forward_time, data.size(0) / step_time
+
+def isolated(fn, *args):
+    ''' fn(*args) in a fresh process, ru_maxrss never decreases so peak_rss_mb() there only covers this call. '''
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(fn, args)
+
+def peak_rss_mb():
+    ''' Peak resident set size of this process (ru_maxrss is in KB on Linux, bytes on macOS). '''
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
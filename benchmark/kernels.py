@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+''' Micro-benchmarks of the neighbor kernels in utils/utility.py on CPU.
+
+Sweeps batch size, num_points, k and channel count for every kernel, reporting wall time,
+peak RSS and throughput. Results are written as JSON and can be compared with a saved baseline:
+
+    python -m benchmark.kernels --output baseline.json
+    python -m benchmark.kernels --output current.json --baseline baseline.json
+'''
+
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import torch
+
+from benchmark.common import isolated
+from benchmark.common import peak_rss_mb
+from utils.utility import get_graph_feature, knn
+
+KERNELS = {
+    'knn': lambda x, k: knn(x, k=k),
+    'knn_bf16': lambda x, k: knn(x, k=k, precision='bf16'),
+    'get_graph_feature': lambda x, k: get_graph_feature(x, k=k),
+}
+
+def run(config, repeat, threads):
+    if threads is not None:
+        torch.set_num_threads(threads)
+    torch.manual_seed(42)
+
+    kernel = KERNELS[config['kernel']]
+    x = torch.rand(config['batch_size'], config['channels'], config['num_points'])
+    rss_before = peak_rss_mb()
+
+    with torch.no_grad():
+        kernel(x, config['k'])
+        ts = time.perf_counter()
+        for _ in range(repeat):
+            kernel(x, config['k'])
+        elapsed = (time.perf_counter() - ts) / repeat
+
+    peak = peak_rss_mb()
+    return dict(config,
+                time_s=elapsed,
+                peak_rss_mb=peak,
+                kernel_rss_mb=peak - rss_before,
+                points_per_s=config['batch_size']*config['num_points'] / elapsed)
+
+def compare(results, baseline, tolerance):
+    ''' Prints the change of every configuration also present in the baseline, returns the regressions. '''
+    def key(result):
+        return tuple(result[name] for name in ['kernel', 'batch_size', 'num_points', 'k', 'channels'])
+
+    reference = {key(result): result for result in baseline['results']}
+    regressions = 0
+    for result in results:
+        if key(result) not in reference:
+            continue
+        old = reference[key(result)]
+        speedup = old['time_s'] / result['time_s']
+        memory = result['kernel_rss_mb'] / max(old['kernel_rss_mb'], 1e-6)
+        regression = speedup < 1 - tolerance
+        regressions += regression
+        print('%-20s %s speedup: %.2fx, kernel rss: %.2fx%s' %
+              (result['kernel'], key(result)[1:], speedup, memory, '  REGRESSION' if regression else ''))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kernels', nargs='+', default=list(KERNELS.keys()), choices=KERNELS.keys())
+    parser.add_argument('--batch_size', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--num_points', type=int, nargs='+', default=[512, 1024, 2048])
+    parser.add_argument('--k', type=int, nargs='+', default=[10, 20, 40])
+    parser.add_argument('--channels', type=int, nargs='+', default=[3, 64, 128])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--in_process', action='store_true', help='Do not spawn a process per configuration (peak RSS becomes cumulative)')
+    parser.add_argument('--output', default='kernels.json')
+    parser.add_argument('--baseline', default=None, help='JSON written by a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='Slowdown reported as a regression')
+    args = parser.parse_args()
+
+    configs = [dict(kernel=kernel, batch_size=batch_size, num_points=num_points, k=k, channels=channels)
+               for kernel, batch_size, num_points, k, channels
+               in itertools.product(args.kernels, args.batch_size, args.num_points, args.k, args.channels)
+               if k <= num_points]
+
+    results = []
+    for config in configs:
+        if args.in_process:
+            result = run(config, args.repeat, args.threads)
+        else:
+            result = isolated(run, config, args.repeat, args.threads)
+        results.append(result)
+        print('%-20s B: %3d, N: %5d, k: %3d, C: %4d, time: %.6f s, peak rss: %.1f MB, kernel rss: %.1f MB, %.0f points/s' %
+              (result['kernel'], result['batch_size'], result['num_points'], result['k'], result['channels'],
+               result['time_s'], result['peak_rss_mb'], result['kernel_rss_mb'], result['points_per_s']))
+
+    meta = {
+        'torch': torch.__version__,
+        'threads': args.threads or torch.get_num_threads(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+''' Dense knn() versus the KD-tree and voxel grid backends for the xyz layer on CPU.
+
+    python -m benchmark.knn_backends --num_points 1024 2048 4096 8192
+'''
+
+import argparse
+import torch
+
+from utils.utility import knn, kdtree_knn, grid_knn
+from utils.utility import measure
+
+def agreement(idx, reference):
+    ''' Fraction of points whose neighbor set matches the reference (order ignored). '''
+    return (idx.sort(dim=-1)[0] == reference.sort(dim=-1)[0]).all(dim=-1).float().mean().item()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[1024, 2048, 4096, 8192])
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+    print('threads: %d' % torch.get_num_threads())
+    with torch.no_grad():
+        for num_points in args.num_points:
+            x = torch.rand(args.batch_size, 3, num_points)
+            reference = knn(x, k=args.k)
+            dense_time = measure(lambda: knn(x, k=args.k), args.repeat)
+            print('num_points: %d, dense: %.6f s' % (num_points, dense_time))
+            for name, backend in [('kdtree', kdtree_knn), ('grid', grid_knn)]:
+                backend_time = measure(lambda: backend(x, k=args.k), args.repeat)
+                match = agreement(backend(x, k=args.k), reference)
+                print('    %s: %.6f s, speedup: %.2fx, agreement: %.4f' % (name, backend_time, dense_time / backend_time, match))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+''' Forward latency saved by reusing the kNN graph across EdgeConv layers (Params.knn_reuse),
+and its ModelNet40 test accuracy when a checkpoint is given. A checkpoint trained without
+reuse measures the drop of switching it on at inference; train with the same knn_reuse in
+main.py for the accuracy of a model trained that way.
+
+    python -m benchmark.knn_reuse --model DGCNN --num_points 1024 2048
+    python -m benchmark.knn_reuse --model DGCNN --checkpoint path/to/best_model.t7
+'''
+
+import argparse
+import torch
+
+from benchmark.common import forward_latency
+from utils.models import MODELS
+from utils.params import Params
+
+SETTINGS = [
+    {'knn_reuse': 'none'},
+    {'knn_reuse': 'group', 'knn_reuse_group': 2},
+    {'knn_reuse': 'xyz'},
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='DGCNN', choices=['DGCNN', 'AttentionDGCNN'])
+    parser.add_argument('--batch_size', type=int, default=16)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[1024, 2048])
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--checkpoint', default=None, help='best_model.t7 to evaluate on the ModelNet40 test partition')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+    for num_points in args.num_points:
+        baseline = None
+        for setting in SETTINGS:
+            params = Params(model=MODELS[args.model], device='cpu', k=args.k, num_points=num_points, dump_file=False, **setting)
+            latency = forward_latency(params.model(params), args.batch_size, num_points, args.repeat)
+            baseline = baseline or latency
+            print('num_points: %d, %s, latency: %.6f s, saved: %.1f%%' % (num_points, setting, latency, 100 * (1 - latency / baseline)))
+
+    if args.checkpoint is not None:
+        from main import test
+
+        for setting in SETTINGS:
+            params = Params(model=MODELS[args.model], device=args.device, k=args.k, dump_file=False, **setting)
+            test_acc, avg_per_class_acc = test(params, state_dict=args.checkpoint)
+            print('%s, test acc: %.6f, test avg acc: %.6f' % (setting, test_acc, avg_per_class_acc))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+''' CPU throughput of each model in the channels_first and channels_last layouts
+(Params.layout), for the eval forward pass and for a training step, with the largest logit
+difference between the two layouts for the same weights.
+
+    python -m benchmark.layout --batch_size 32 --num_points 1024
+'''
+
+import argparse
+import torch
+
+from benchmark.common import throughput
+from utils.models import MODELS
+from utils.params import Params
+
+LAYOUTS = ['channels_first', 'channels_last']
+
+def build(name, layout, num_points, state_dict=None):
+    params = Params(model=MODELS[name], device='cpu', num_points=num_points, layout=layout, dump_file=False)
+    model = params.model(params)
+    if state_dict is not None:
+        model.load_state_dict(state_dict)
+    return model
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=list(MODELS.keys()), choices=MODELS.keys())
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_points', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name in args.models:
+        torch.manual_seed(42)
+        clouds = torch.rand(args.batch_size, args.num_points, 3)
+        label = torch.randint(40, (args.batch_size,))
+        inputs = {'channels_first': clouds.permute(0, 2, 1), 'channels_last': clouds}
+
+        first = build(name, 'channels_first', args.num_points).eval()
+        models = {'channels_first': first, 'channels_last': build(name, 'channels_last', args.num_points, first.state_dict()).eval()}
+        with torch.no_grad():
+            error = (models['channels_first'](inputs['channels_first']) - models['channels_last'](inputs['channels_last'])).abs().max().item()
+
+        for layout in LAYOUTS:
+            forward_rate, step_rate = throughput(models[layout], inputs[layout], label, args.repeat)
+            print('%-17s %-14s B: %d, N: %d, eval: %.1f clouds/s, train: %.1f clouds/s' %
+                  (name, layout, args.batch_size, args.num_points, forward_rate, step_rate))
+        print('%-17s max logit difference between layouts: %.2e' % (name, error))
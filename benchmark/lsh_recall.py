@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+''' Recall and speed of the approximate 'lsh' neighbor search against the exact knn(),
+and end-to-end ModelNet40 test accuracy of a trained checkpoint with each backend.
+
+    python -m benchmark.lsh_recall --num_points 4096 8192 16384 --tables 1 2 4 8
+    python -m benchmark.lsh_recall --checkpoint path/to/best_model.t7 --model DGCNN
+'''
+
+import time
+import argparse
+import torch
+
+from utils.models import MODELS
+from utils.params import Params
+from utils.utility import knn, lsh_knn
+
+def recall(idx, reference):
+    ''' Fraction of the exact neighbors that were also found by idx. '''
+    hits = (idx.unsqueeze(-1) == reference.unsqueeze(-2)).any(dim=-1)
+    return hits.float().mean().item()
+
+def point_features(batch_size, num_points, num_dims):
+    ''' Features with the manifold structure of the learned ones: a random two layer
+    MLP applied to points sampled on a sphere. '''
+    xyz = torch.nn.functional.normalize(torch.randn(batch_size, 3, num_points), dim=1)
+    hidden = torch.tanh(torch.matmul(torch.randn(num_dims, 3), xyz))
+    return torch.tanh(torch.matmul(torch.randn(num_dims, num_dims) / num_dims**0.5, hidden))
+
+def measure(fn):
+    ts = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - ts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch_size', type=int, default=4)
+    parser.add_argument('--num_points', type=int, nargs='+', default=[4096, 8192, 16384])
+    parser.add_argument('--num_dims', type=int, nargs='+', default=[64, 128])
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--tables', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--window', type=int, default=None)
+    parser.add_argument('--tile_size', type=int, default=2048)
+    parser.add_argument('--checkpoint', default=None, help='best_model.t7 to evaluate on the ModelNet40 test partition')
+    parser.add_argument('--model', default='DGCNN', choices=['DGCNN', 'AttentionDGCNN'])
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    torch.manual_seed(42)
+    with torch.no_grad():
+        for num_dims in args.num_dims:
+            for num_points in args.num_points:
+                x = point_features(args.batch_size, num_points, num_dims)
+                reference, exact_time = measure(lambda: knn(x, k=args.k, tile_size=args.tile_size))
+                print('num_dims: %d, num_points: %d, exact: %.6f s' % (num_dims, num_points, exact_time))
+                for tables in args.tables:
+                    idx, lsh_time = measure(lambda: lsh_knn(x, k=args.k, num_tables=tables, window=args.window, tile_size=args.tile_size))
+                    print('    lsh tables: %d, time: %.6f s, speedup: %.2fx, recall: %.4f' %
+                          (tables, lsh_time, exact_time / lsh_time, recall(idx, reference)))
+
+    if args.checkpoint is not None:
+        from main import test
+
+        settings = [{'feature_knn_backend': 'dense'}]
+        settings += [{'feature_knn_backend': 'lsh', 'lsh_tables': tables, 'lsh_window': args.window} for tables in args.tables]
+        for setting in settings:
+            params = Params(model=MODELS[args.model], device=args.device, k=args.k, dump_file=False, **setting)
+            test_acc, avg_per_class_acc = test(params, state_dict=args.checkpoint)
+            print('%s, test acc: %.6f, test avg acc: %.6f' % (setting, test_acc, avg_per_class_acc))
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+''' CPU throughput of each model with Params.precision 'fp32' and 'bf16' (bfloat16 autocast),
+for the eval forward pass and for a training step, and ModelNet40 test accuracy of
+checkpoints evaluated in both precisions. bf16 only pays off on CPUs with native bfloat16
+support (AVX512-BF16 / AMX).
+
+    python -m benchmark.precision --batch_size 32
+    python -m benchmark.precision --checkpoint DGCNN=path/to/best_model.t7
+'''
+
+import argparse
+import torch
+
+from benchmark.common import throughput
+from utils.models import MODELS
+from utils.params import Params
+
+PRECISIONS = ['fp32', 'bf16']
+
+def build(name, precision, num_points):
+    torch.manual_seed(42)
+    params = Params(model=MODELS[name], device='cpu', num_points=num_points, precision=precision, dump_file=False)
+    return params.model(params)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=list(MODELS.keys()), choices=MODELS.keys())
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_points', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--checkpoint', action='append', default=[], help='MODEL=PATH of a trained checkpoint')
+    args = parser.parse_args()
+
+    for name in args.models:
+        for precision in PRECISIONS:
+            data = torch.rand(args.batch_size, 3, args.num_points)
+            label = torch.randint(40, (args.batch_size,))
+            forward_rate, step_rate = throughput(build(name, precision, args.num_points), data, label, args.repeat)
+            print('%-17s %s  B: %d, N: %d, eval: %.1f clouds/s, train: %.1f clouds/s' %
+                  (name, precision, args.batch_size, args.num_points, forward_rate, step_rate))
+
+    if args.checkpoint:
+        from main import test
+
+        for checkpoint in args.checkpoint:
+            name, path = checkpoint.split('=', 1)
+            for precision in PRECISIONS:
+                params = Params(model=MODELS[name], device='cpu', num_points=args.num_points, precision=precision, dump_file=False)
+                test_acc, avg_per_class_acc = test(params, state_dict=path)
+                print('%-17s %s  test acc: %.6f, test avg acc: %.6f' % (name, precision, test_acc, avg_per_class_acc))
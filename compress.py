@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+''' Smaller and faster CPU variants of a trained checkpoint, reported against the fp32 model
+(state_dict size, latency on a random batch, accuracy on the ModelNet40 test partition).
+
+    python compress.py dynamic --model AttentionDGCNN --checkpoint path/to/best_model.t7
+    python compress.py static --model DGCNN --checkpoint path/to/best_model.t7 --calibration_batches 32
+    python compress.py prune --model PointNet --checkpoint path/to/best_model.t7 --ratios 0.25 0.5 0.75 --finetune_epochs 5
+    python compress.py factorize --model DGCNN --checkpoint path/to/best_model.t7 --energy 0.9 --finetune_epochs 2
+
+Params of the checkpoint (att_heads, emb_dims, k...) can be given with --set name=value.
+'''
+
+import io
+import copy
+import argparse
+import torch
+
+from torch.utils.data import DataLoader
+
+from main import evaluation_dataset
+from main import test
+from main import train
+from utils.low_rank import factorize_model
+from utils.models import add_model_arguments
+from utils.models import build_model
+from utils.models import forward_flops
+from utils.models import random_clouds
+from utils.params import Params
+from utils.pruning import prune_model
+from utils.quantization import dynamic_quantize
+from utils.quantization import static_quantize
+from utils.utility import load_checkpoint
+from utils.utility import measure
+
+def model_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 2**20
+
+def report(name, model, args):
+    example = random_clouds(model.args, args.batch_size)
+    with torch.no_grad():
+        latency = measure(lambda: model(example), args.repeat)
+    test_acc, avg_per_class_acc = test(model.args, model=model)
+    print('%s: size: %.2f MB, batch: %d, latency: %.6f s, test acc: %.6f, test avg acc: %.6f' %
+          (name, model_size_mb(model), args.batch_size, latency, test_acc, avg_per_class_acc))
+    return latency, test_acc, avg_per_class_acc
+
+def compress_dynamic(args):
+    model = build_model(args)
+    report('fp32', model, args)
+    report('int8 dynamic', dynamic_quantize(model), args)
+
+def compress_static(args):
+    model = build_model(args)
+    # The quantized model computes its own kNN graph, the cached one would be dropped
+    params = copy.copy(model.args)
+    params.knn_cache = False
+    calibration_loader = DataLoader(evaluation_dataset(params, 'validation'),
+                                    batch_size=params.test_batch_size, shuffle=True, drop_last=False)
+    report('fp32', model, args)
+    report('int8 static', static_quantize(model, calibration_loader, num_batches=args.calibration_batches), args)
+
+def finetune(model, args):
+    ''' Trains model for args.finetune_epochs with train() and returns its best validation state.
+    A fresh Params gets a new execution id, so train() does not resume another run. '''
+    settings = {name: value for name, value in vars(model.args).items() if name not in ('output_dir', 'execution_id')}
+    params = Params(**dict(settings, epochs=args.finetune_epochs, device=args.device, dump_file=True))
+    model.args = params
+
+    train(params, model=model)
+    model.load_state_dict(load_checkpoint(params.best_checkpoint(), params.device))
+
+    # Back on the CPU, where report() measures and tests it like the uncompressed model
+    params.device = 'cpu'
+    return model.cpu()
+
+def compress_prune(args):
+    model = build_model(args)
+    curve = [(0.0,) + report('fp32', model, args)]
+    for ratio in args.ratios:
+        pruned = prune_model(model, ratio)
+        if args.finetune_epochs > 0:
+            pruned = finetune(pruned, args)
+        curve.append((ratio,) + report('pruned %.2f' % ratio, pruned.eval(), args))
+
+    print('ratio,latency,test_acc,test_avg_acc')
+    for row in curve:
+        print('%.2f,%.6f,%.6f,%.6f' % row)
+
+def compress_factorize(args):
+    model = build_model(args)
+    factorized = factorize_model(copy.deepcopy(model), layers=args.layers, rank=args.rank, energy=args.energy)
+    if args.finetune_epochs > 0:
+        factorized = finetune(factorized, args)
+
+    for name in args.layers:
+        print('%s: %s' % (name, getattr(factorized, name)))
+    for name, candidate in (('fp32', model), ('factorized', factorized.eval())):
+        print('%s: %.3f GFLOPs per cloud' % (name, forward_flops(candidate, args.num_points) / 1e9))
+        report(name, candidate, args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    dynamic = commands.add_parser('dynamic', help='INT8 dynamic quantization of the convs, linear layers and attention projections')
+    add_model_arguments(dynamic)
+    dynamic.set_defaults(run=compress_dynamic)
+
+    static = commands.add_parser('static', help='INT8 static quantization calibrated on the ModelNet40 validation partition')
+    add_model_arguments(static)
+    static.add_argument('--calibration_batches', type=int, default=None, help='Validation batches streamed through the observers, all by default')
+    static.set_defaults(run=compress_static)
+
+    prune = commands.add_parser('prune', help='Remove the conv5 and EdgeConv channels with the smallest BatchNorm gamma and fine-tune')
+    add_model_arguments(prune)
+    prune.add_argument('--ratios', type=float, nargs='+', default=[0.25, 0.5, 0.75], help='Fractions of the channels removed')
+    prune.add_argument('--finetune_epochs', type=int, default=5)
+    prune.add_argument('--device', default='cpu', help='Device of the fine-tuning')
+    prune.set_defaults(run=compress_prune)
+
+    factorize = commands.add_parser('factorize', help='Replace conv5 and linear1 with truncated-SVD factorized pairs')
+    add_model_arguments(factorize)
+    factorize.add_argument('--layers', nargs='+', default=['conv5', 'linear1'])
+    target = factorize.add_mutually_exclusive_group()
+    target.add_argument('--rank', type=int, default=None)
+    target.add_argument('--energy', type=float, default=0.9, help='Fraction of the squared singular values kept')
+    factorize.add_argument('--finetune_epochs', type=int, default=0)
+    factorize.add_argument('--device', default='cpu', help='Device of the fine-tuning')
+    factorize.set_defaults(run=compress_factorize)
+
+    args = parser.parse_args()
+    torch.manual_seed(42)
+    args.run(args)
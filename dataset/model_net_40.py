@@ -10,6 +10,8 @@ from torch.utils.data import Dataset
 from torch.optim.lr_scheduler import CosineAnnealingLR
 from sklearn.model_selection import train_test_split
 
+from utils.knn_cache import KnnGraphCache
+
 class ModelNet40(Dataset):
 
     def jitter_pointcloud(self, pointcloud, sigma=0.01, clip=0.02):
@@ -64,11 +66,14 @@ class ModelNet40(Dataset):
             else:
                 return test_data, test_label, label_description
 
-    def __init__(self, num_points, partition='train', random_state=42):
+    def __init__(self, num_points, partition='train', random_state=42, knn_cache_k=None):
         self.num_points = num_points
         self.partition = partition
         self.random_state = random_state
         self.data, self.label, self.label_description = self.load_data(partition)
+        self.knn_cache = None
+        if knn_cache_k is not None:
+            self.knn_cache = KnnGraphCache(self, knn_cache_k)
 
     def __getitem__(self, item):
         pointcloud = self.data[item][:self.num_points]
@@ -77,6 +82,8 @@ class ModelNet40(Dataset):
             pointcloud = self.translate_pointcloud(pointcloud)
             pointcloud = self.jitter_pointcloud(pointcloud)
 
+        if self.knn_cache is not None:
+            return pointcloud, label, self.knn_cache[item]
         return pointcloud, label
 
     def label_description(self):
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+''' Export a trained checkpoint for CPU inference at a fixed number of points.
+
+    python export.py torchscript --model DGCNN --checkpoint path/to/best_model.t7 --output dgcnn.pt --compile
+    python export.py onnx --model DGCNN --checkpoint path/to/best_model.t7 --output dgcnn.onnx --throughput
+
+Params of the checkpoint (att_heads, emb_dims, k...) and inference options such as
+attention_impl can be given with --set name=value.
+'''
+
+import time
+import argparse
+import numpy as np
+import torch
+
+from torch.utils.data import DataLoader
+
+from dataset.model_net_40 import ModelNet40
+from utils.models import add_model_arguments
+from utils.models import build_model
+from utils.models import random_clouds
+from utils.utility import measure
+
+def export_torchscript(args):
+    model = build_model(args)
+    example = random_clouds(model.args, args.batch_size)
+
+    with torch.no_grad():
+        # optimize_for_inference writes DGCNN graphs that torch.jit.load rejects, freeze round-trips
+        torch.jit.freeze(torch.jit.trace(model, example)).save(args.output)
+        traced = torch.jit.load(args.output)
+        print('saved %s, specialized for %d points' % (args.output, args.num_points))
+
+        # Parity of the reloaded artifact on a batch size other than the traced one
+        points = random_clouds(model.args, args.batch_size + 1)
+        error = (traced(points) - model(points)).abs().max().item()
+        print('parity: max abs logit error: %.2e' % error)
+        if error > args.tolerance:
+            raise SystemExit('TorchScript logits differ from PyTorch by %.2e (tolerance %.2e)' % (error, args.tolerance))
+
+        eager_time = measure(lambda: model(example), args.repeat)
+        traced_time = measure(lambda: traced(example), args.repeat)
+        print('batch: %d, eager: %.6f s, torchscript: %.6f s, speedup: %.2fx' %
+              (args.batch_size, eager_time, traced_time, eager_time / traced_time))
+
+        if args.compile:
+            compiled = torch.compile(model)
+            compiled_time = measure(lambda: compiled(example), args.repeat, warmup=2)
+            print('batch: %d, eager: %.6f s, torch.compile: %.6f s, speedup: %.2fx' %
+                  (args.batch_size, eager_time, compiled_time, eager_time / compiled_time))
+
+def test_throughput(model, engine, args):
+    ''' Clouds per second and accuracy of eager PyTorch and ONNX Runtime on the ModelNet40 test partition. '''
+    test_loader = DataLoader(ModelNet40(partition='test', num_points=args.num_points), batch_size=args.batch_size, drop_last=False)
+
+    eager_time, onnx_time = 0.0, 0.0
+    eager_correct, onnx_correct, count = 0, 0, 0
+    with torch.no_grad():
+        for data, label in test_loader:
+            if not model.channels_last:
+                data = data.permute(0, 2, 1).contiguous()
+            label = label.view(-1).numpy()
+
+            ts = time.perf_counter()
+            eager_logits = model(data).numpy()
+            eager_time += time.perf_counter() - ts
+
+            ts = time.perf_counter()
+            onnx_logits = engine(data)
+            onnx_time += time.perf_counter() - ts
+
+            eager_correct += (eager_logits.argmax(axis=1) == label).sum()
+            onnx_correct += (onnx_logits.argmax(axis=1) == label).sum()
+            count += len(label)
+
+    print('eager: %.1f clouds/s, acc: %.6f' % (count / eager_time, eager_correct / count))
+    print('onnxruntime: %.1f clouds/s, acc: %.6f, speedup: %.2fx' % (count / onnx_time, onnx_correct / count, eager_time / onnx_time))
+
+def export_onnx(args):
+    from utils.inference import OnnxInferenceEngine
+
+    model = build_model(args)
+    example = random_clouds(model.args, args.batch_size)
+    with torch.no_grad():
+        torch.onnx.export(model, example, args.output, opset_version=args.opset,
+                          input_names=['points'], output_names=['logits'],
+                          dynamic_axes={'points': {0: 'batch_size'}, 'logits': {0: 'batch_size'}})
+    print('saved %s, specialized for %d points' % (args.output, args.num_points))
+
+    engine = OnnxInferenceEngine(args.output, intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads)
+
+    # Parity of the logits on a batch size other than the exported one
+    points = random_clouds(model.args, args.batch_size + 1)
+    with torch.no_grad():
+        expected = model(points).numpy()
+    actual = engine(points)
+    error = np.abs(actual - expected).max()
+    agreement = (actual.argmax(axis=1) == expected.argmax(axis=1)).mean()
+    print('parity: max abs logit error: %.2e, argmax agreement: %.4f' % (error, agreement))
+    if error > args.tolerance:
+        raise SystemExit('ONNX logits differ from PyTorch by %.2e (tolerance %.2e)' % (error, args.tolerance))
+
+    if args.throughput:
+        test_throughput(model, engine, args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    torchscript = commands.add_parser('torchscript', help='Trace and freeze the model, check the saved file against eager and report their CPU latency')
+    add_model_arguments(torchscript)
+    torchscript.add_argument('--output', required=True)
+    torchscript.add_argument('--compile', action='store_true', help='Also report torch.compile latency')
+    torchscript.add_argument('--tolerance', type=float, default=1e-3, help='Largest logit difference accepted by the parity check')
+    torchscript.set_defaults(run=export_torchscript)
+
+    onnx = commands.add_parser('onnx', help='Export to ONNX, check parity with PyTorch and run it with ONNX Runtime')
+    add_model_arguments(onnx)
+    onnx.add_argument('--output', required=True)
+    onnx.add_argument('--opset', type=int, default=17)
+    onnx.add_argument('--intra_op_threads', type=int, default=0)
+    onnx.add_argument('--inter_op_threads', type=int, default=0)
+    onnx.add_argument('--tolerance', type=float, default=1e-3, help='Largest logit difference accepted by the parity check')
+    onnx.add_argument('--throughput', action='store_true', help='Compare with eager PyTorch on the ModelNet40 test partition')
+    onnx.set_defaults(run=export_onnx)
+
+    args = parser.parse_args()
+    torch.manual_seed(42)
+    args.run(args)
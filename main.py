@@ -3,13 +3,18 @@
 from utils.params import Params
 
 import os
+import copy
 import time
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
+from utils.utility import autocast
 from utils.utility import calculate_loss
+from utils.utility import distillation_loss
+from utils.utility import load_checkpoint
+from utils.teacher_cache import TeacherLogitsCache
 
 from torch.utils.data import DataLoader
 from torch.optim.lr_scheduler import CosineAnnealingLR
@@ -26,29 +31,64 @@ from model.point_net import PointNet
 
 import sklearn.metrics as metrics
 
-def train(args):
-    train_loader = DataLoader(args.dataset_loader(partition='train', num_points=args.num_points, random_state=args.random_state),
+def uses_knn_cache(args):
+    ''' only the DGCNN family takes the precomputed xyz kNN graph, the PointNet family ignores Params.knn_cache '''
+    return args.knn_cache and args.model in (DGCNN, AttentionDGCNN)
+
+def evaluation_dataset(args, partition):
+    ''' validation and test samples are never augmented, so their xyz kNN graph can be read from the disk cache '''
+    if uses_knn_cache(args):
+        return args.dataset_loader(partition=partition, num_points=args.num_points, random_state=args.random_state, knn_cache_k=args.k)
+    return args.dataset_loader(partition=partition, num_points=args.num_points, random_state=args.random_state)
+
+def load_teacher(args):
+    ''' frozen distillation teacher (Params.teacher), built with the Params.teacher_params overrides '''
+    params = copy.copy(args)
+    for name, value in args.teacher_params.items():
+        setattr(params, name, value)
+    # the teacher reads the student's batches
+    params.model, params.layout, params.device = args.teacher, args.layout, args.device
+
+    teacher = args.teacher(params)
+    teacher.load_state_dict(load_checkpoint(args.teacher_checkpoint, args.device))
+    teacher = teacher.to(args.device).eval()
+    for parameter in teacher.parameters():
+        parameter.requires_grad_(False)
+    return teacher
+
+def train(args, model=None):
+    ''' model fine-tunes an already built (e.g. pruned) model instead of a new args.model '''
+    train_dataset = args.dataset_loader(partition='train', num_points=args.num_points, random_state=args.random_state)
+    teacher = None
+    if args.teacher != None:
+        teacher = load_teacher(args)
+        if args.teacher_cache:
+            train_dataset = TeacherLogitsCache(train_dataset, teacher, args.teacher_checkpoint, args.number_classes, device=args.device)
+            teacher = None
+    train_loader = DataLoader(train_dataset,
                               num_workers=8, batch_size=args.batch_size, shuffle=True, drop_last=True)
-    validation_loader = DataLoader(args.dataset_loader(partition='validation', num_points=args.num_points, random_state=args.random_state),
+    validation_loader = DataLoader(evaluation_dataset(args, 'validation'),
                                    num_workers=8, batch_size=args.test_batch_size, shuffle=True, drop_last=False)
     device = args.device
-    model = params.model(params).to(params.device)
+    if model == None:
+        model = args.model(args)
+    model = model.to(args.device)
     args.log(str(model),False)
     model = nn.DataParallel(model)
     print("Let's use", torch.cuda.device_count(), "GPUs!")
 
     if args.optimizer == 'SGD':
-        print(f"{str(params.model)} use SGD")
+        print(f"{str(args.model)} use SGD")
         opt = torch.optim.SGD(model.parameters(), lr=args.lr, momentum=args.momentum, weight_decay=1e-4)
     else:
-        print(f"{str(params.model)} use Adam")
+        print(f"{str(args.model)} use Adam")
         opt = torch.optim.Adam(model.parameters(), lr=args.lr, weight_decay=1e-4)
 
     scheduler = CosineAnnealingLR(opt, args.epochs, eta_min=args.lr)
     criterion = calculate_loss
 
     if args.last_checkpoint() != "":
-        model.load_state_dict(torch.load(args.last_checkpoint()))
+        model.load_state_dict(torch.load(args.last_checkpoint(), map_location=device))
 
     global_best_loss, global_best_acc, global_best_avg_acc = 0, 0, 0
     for epoch in range(args.epochs):
@@ -64,14 +104,25 @@ def train(args):
             model.train()
             train_pred = []
             train_true = []
-            for data, label in train_loader:
-                data, label = data.to(device), label.to(device).squeeze()
-                data = data.permute(0, 2, 1)
+            for batch in train_loader:
+                data, label = batch[0].to(device), batch[1].to(device).squeeze()
+                if args.layout == 'channels_first':
+                    data = data.permute(0, 2, 1)
                 batch_size = data.size()[0]
                 opt.zero_grad()
-                logits = model(data)
-
-                loss = criterion(logits, label)
+                with autocast(args):
+                    logits = model(data)
+                logits = logits.float()
+
+                if args.teacher == None:
+                    loss = criterion(logits, label)
+                else:
+                    if teacher == None: # logits read from the TeacherLogitsCache
+                        teacher_logits = batch[2].to(device)
+                    else:
+                        with torch.no_grad(), autocast(args):
+                            teacher_logits = teacher(data).float()
+                    loss = distillation_loss(logits, label, teacher_logits, alpha=args.distill_alpha, temperature=args.distill_temperature)
                 loss.backward()
                 opt.step()
                 preds = logits.max(dim=1)[1]
@@ -102,11 +153,17 @@ def train(args):
             val_true = []
 
             # best_val_loss, best_val_acc, best_val_avg_acc = 0, 0, 0
-            for data, label in validation_loader:
-                data, label = data.to(device), label.to(device).squeeze()
-                data = data.permute(0, 2, 1)
+            for batch in validation_loader:
+                data, label = batch[0].to(device), batch[1].to(device).squeeze()
+                if args.layout == 'channels_first':
+                    data = data.permute(0, 2, 1)
                 batch_size = data.size()[0]
-                logits = model(data)
+                with autocast(args):
+                    if uses_knn_cache(args):
+                        logits = model(data, batch[2].to(device).long())
+                    else:
+                        logits = model(data)
+                logits = logits.float()
                 loss = criterion(logits, label)
                 preds = logits.max(dim=1)[1]
                 count += batch_size
@@ -137,18 +194,21 @@ def train(args):
         torch.cuda.empty_cache()
     args.print_summary(global_best_loss, global_best_acc, global_best_avg_acc)
 
-def test(args, state_dict=None):
-    test_loader = DataLoader(args.dataset_loader(partition='test', num_points=args.num_points, random_state=args.random_state),
+def test(args, state_dict=None, model=None):
+    ''' model evaluates an already built (e.g. compressed) model instead of a checkpoint '''
+    test_loader = DataLoader(evaluation_dataset(args, 'test'),
                              batch_size=args.test_batch_size, shuffle=True, drop_last=False)
 
     device = args.device
-    model = params.model(params).to(params.device)
-    model = nn.DataParallel(model)
+    model_given = model != None
+    if model == None:
+        model = args.model(args).to(args.device)
+        model = nn.DataParallel(model)
 
-    if state_dict != None:
-        model.load_state_dict(torch.load(state_dict))
-    else:
-        model.load_state_dict(torch.load(params.best_checkpoint()))
+        if state_dict != None:
+            model.load_state_dict(torch.load(state_dict, map_location=device))
+        else:
+            model.load_state_dict(torch.load(args.best_checkpoint(), map_location=device))
 
     with torch.no_grad():
         model = model.eval()
@@ -156,11 +216,17 @@ def test(args, state_dict=None):
         count = 0.0
         test_true = []
         test_pred = []
-        for data, label in test_loader:
-            data, label = data.to(device), label.to(device).squeeze()
-            data = data.permute(0, 2, 1)
+        for batch in test_loader:
+            data, label = batch[0].to(device), batch[1].to(device).squeeze()
+            if args.layout == 'channels_first':
+                data = data.permute(0, 2, 1)
             batch_size = data.size()[0]
-            logits = model(data)
+            with autocast(args):
+                if uses_knn_cache(args):
+                    logits = model(data, batch[2].to(device).long())
+                else:
+                    logits = model(data)
+            logits = logits.float()
             preds = logits.max(dim=1)[1]
             test_true.append(label.cpu().numpy())
             test_pred.append(preds.detach().cpu().numpy())
@@ -168,7 +234,7 @@ def test(args, state_dict=None):
         test_pred = np.concatenate(test_pred)
         test_acc = metrics.accuracy_score(test_true, test_pred)
         avg_per_class_acc = metrics.balanced_accuracy_score(test_true, test_pred)
-        if state_dict == None:
+        if state_dict == None and not model_given:
             outstr = 'TEST:: test acc: %.6f, test avg acc: %.6f'%(test_acc, avg_per_class_acc)
             args.log('====================================================================')
             args.log(outstr)
@@ -2,8 +2,15 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from utils.utility import checkpointed_blocks
+from utils.utility import conv_block
+from utils.utility import edge_conv
 from utils.utility import get_graph_feature
+from utils.utility import is_channels_last
 from utils.utility import knn
+from utils.utility import layer_knn
+from utils.utility import pool_points
+from utils.attention import self_attention
 
 
 class AttentionDGCNN(nn.Module):
@@ -11,6 +18,13 @@ class AttentionDGCNN(nn.Module):
         super(AttentionDGCNN, self).__init__()
         self.args = args
         self.k = args.k
+        self.edge_conv_mode = args.edge_conv_mode
+        self.edge_conv_chunk = args.edge_conv_chunk
+        self.checkpoint_edge_conv, self.checkpoint_attention = checkpointed_blocks(args)
+        self.channels_last = is_channels_last(args)
+        self.attention_impl = args.attention_impl
+        self.attention_chunk = args.attention_chunk
+        self.attention_axis = args.attention_axis
 
         self.bn1 = nn.BatchNorm2d(64)
         self.bn2 = nn.BatchNorm2d(64)
@@ -55,59 +69,45 @@ class AttentionDGCNN(nn.Module):
         self.dp2 = nn.Dropout(p=args.dropout)
         self.linear3 = nn.Linear(256, args.number_classes)
 
-    def forward(self, x):
-        batch_size = x.size(0)
+    def forward(self, x, idx=None):
+        ''' x is [B, 3, N], or [B, N, 3] in the channels_last layout where the point features stay
+        [B, N, C] (the attention blocks only take transposed views of them). '''
+        last = self.channels_last
 
-        x = get_graph_feature(x, k=self.k)      #[32, 6, 1024, 40]
-        x = self.conv1(x)                       #[32, 64, 1024, 40]
-        x1 = x.max(dim=-1, keepdim=False)[0]    #[32, 64, 1024]
+        idx = layer_knn(x, self.args, 0, idx, channels_last=last)
+        x1 = edge_conv(x, self.conv1, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last) #[32, 64, 1024]
 
         residual = x1
-        x1_T = x1.transpose(1, 2)               #[32, 1024, 64]
-        x1_att, _ = self.attn1(x1_T,x1_T,x1_T)  #[32, 1024, 64]
-        x1 = x1_att.transpose(1,2)              #[32, 64, 1024]
-        del x1_T, x1_att, _
+        x1 = self_attention(self.attn1, x1, impl=self.attention_impl, chunk_size=self.attention_chunk, axis=self.attention_axis, idx=idx, checkpoint=self.checkpoint_attention, channels_last=last) #[32, 64, 1024]
         x1 += residual
 
-        x = get_graph_feature(x1, k=self.k)
-        x = self.conv2(x)
-        x2 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x1, self.args, 1, idx, channels_last=last)
+        x2 = edge_conv(x1, self.conv2, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
         residual = x2
-        x2_T = x2.transpose(1, 2)
-        x2_att, _ = self.attn2(x2_T,x2_T,x2_T)
-        x2 = x2_att.transpose(1,2)
-        del x2_T, x2_att, _
+        x2 = self_attention(self.attn2, x2, impl=self.attention_impl, chunk_size=self.attention_chunk, axis=self.attention_axis, idx=idx, checkpoint=self.checkpoint_attention, channels_last=last)
         x2 += residual
 
-        x = get_graph_feature(x2, k=self.k)
-        x = self.conv3(x)
-        x3 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x2, self.args, 2, idx, channels_last=last)
+        x3 = edge_conv(x2, self.conv3, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
         residual = x3
-        x3_T = x3.transpose(1, 2)
-        x3_att, _ = self.attn3(x3_T,x3_T,x3_T)
-        x3 = x3_att.transpose(1,2)
-        del x3_T, x3_att, _
+        x3 = self_attention(self.attn3, x3, impl=self.attention_impl, chunk_size=self.attention_chunk, axis=self.attention_axis, idx=idx, checkpoint=self.checkpoint_attention, channels_last=last)
         x3 += residual
 
-        x = get_graph_feature(x3, k=self.k) #uncomment to disable attention
-        x = self.conv4(x)
-        x4 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x3, self.args, 3, idx, channels_last=last)
+        x4 = edge_conv(x3, self.conv4, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
         residual = x4
-        x4_T = x4.transpose(1, 2)
-        x4_att, _ = self.attn4(x4_T,x4_T,x4_T)
-        x4 = x4_att.transpose(1,2)
-        del x4_T, x4_att, _
+        x4 = self_attention(self.attn4, x4, impl=self.attention_impl, chunk_size=self.attention_chunk, axis=self.attention_axis, idx=idx, checkpoint=self.checkpoint_attention, channels_last=last)
         x4 += residual
 
-        x = torch.cat((x1, x2, x3, x4), dim=1)
+        x = torch.cat((x1, x2, x3, x4), dim=-1 if last else 1)
 
-        x = self.conv5(x)
+        x = conv_block(self.conv5, x, channels_last=last)
 
-        x1 = F.adaptive_max_pool1d(x, 1).view(batch_size, -1)
-        x2 = F.adaptive_avg_pool1d(x, 1).view(batch_size, -1)
+        x1 = pool_points(x, 'max', channels_last=last)
+        x2 = pool_points(x, 'mean', channels_last=last)
         x = torch.cat((x1, x2), 1)
 
         x = F.leaky_relu(self.bn6(self.linear1(x)), negative_slope=0.2)
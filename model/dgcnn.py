@@ -2,13 +2,17 @@ import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from utils.utility import get_graph_feature, knn
+from utils.utility import checkpointed_blocks, conv_block, edge_conv, get_graph_feature, is_channels_last, knn, layer_knn, pool_points
 
 class DGCNN(nn.Module):
     def __init__(self, args):
         super(DGCNN, self).__init__()
         self.args = args
         self.k = args.k
+        self.edge_conv_mode = args.edge_conv_mode
+        self.edge_conv_chunk = args.edge_conv_chunk
+        self.checkpoint_edge_conv, _ = checkpointed_blocks(args)
+        self.channels_last = is_channels_last(args)
 
         self.bn1 = nn.BatchNorm2d(64)
         self.bn2 = nn.BatchNorm2d(64)
@@ -39,29 +43,27 @@ class DGCNN(nn.Module):
         self.dp2 = nn.Dropout(p=args.dropout)
         self.linear3 = nn.Linear(256, args.number_classes)
 
-    def forward(self, x):
-        batch_size = x.size(0)
-        x = get_graph_feature(x, k=self.k)
-        x = self.conv1(x)
-        x1 = x.max(dim=-1, keepdim=False)[0]
+    def forward(self, x, idx=None):
+        ''' x is [B, 3, N], or [B, N, 3] in the channels_last layout where the point features stay [B, N, C]. '''
+        last = self.channels_last
 
-        x = get_graph_feature(x1, k=self.k)
-        x = self.conv2(x)
-        x2 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x, self.args, 0, idx, channels_last=last)
+        x1 = edge_conv(x, self.conv1, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
-        x = get_graph_feature(x2, k=self.k)
-        x = self.conv3(x)
-        x3 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x1, self.args, 1, idx, channels_last=last)
+        x2 = edge_conv(x1, self.conv2, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
-        x = get_graph_feature(x3, k=self.k)
-        x = self.conv4(x)
-        x4 = x.max(dim=-1, keepdim=False)[0]
+        idx = layer_knn(x2, self.args, 2, idx, channels_last=last)
+        x3 = edge_conv(x2, self.conv3, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
-        x = torch.cat((x1, x2, x3, x4), dim=1)
+        idx = layer_knn(x3, self.args, 3, idx, channels_last=last)
+        x4 = edge_conv(x3, self.conv4, k=self.k, idx=idx, mode=self.edge_conv_mode, chunk_size=self.edge_conv_chunk, checkpoint=self.checkpoint_edge_conv, channels_last=last)
 
-        x = self.conv5(x)
-        x1 = F.adaptive_max_pool1d(x, 1).view(batch_size, -1)
-        x2 = F.adaptive_avg_pool1d(x, 1).view(batch_size, -1)
+        x = torch.cat((x1, x2, x3, x4), dim=-1 if last else 1)
+
+        x = conv_block(self.conv5, x, channels_last=last)
+        x1 = pool_points(x, 'max', channels_last=last)
+        x2 = pool_points(x, 'mean', channels_last=last)
         x = torch.cat((x1, x2), 1)
 
         x = F.leaky_relu(self.bn6(self.linear1(x)), negative_slope=0.2)
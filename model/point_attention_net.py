@@ -1,18 +1,38 @@
 import numpy as np
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from utils.utility import get_graph_feature
+from utils.utility import checkpointed_blocks
+from utils.utility import conv_norm
+from utils.utility import is_channels_last
 from utils.utility import knn
+from utils.utility import point_norm
+from utils.utility import pointwise_conv
+from utils.utility import pool_points
+from utils.attention import self_attention
 
 class PointAttentionNet(nn.Module):
     def __init__(self, args):
         super(PointAttentionNet, self).__init__()
         self.args = args
+        self.attention_impl = args.attention_impl
+        self.attention_chunk = args.attention_chunk
+        self.attention_axis = args.attention_axis
+        _, self.checkpoint_attention = checkpointed_blocks(args)
+        self.channels_last = is_channels_last(args)
 
         self.attn1 = nn.MultiheadAttention(64, args.att_heads)
         self.attn2 = nn.MultiheadAttention(64, args.att_heads)
         self.attn3 = nn.MultiheadAttention(128, args.att_heads)
 
+        if args.attention_impl == 'inducing':
+            self.anchors1 = nn.Parameter(nn.init.xavier_uniform_(torch.empty(args.inducing_points, 64)))
+            self.anchors2 = nn.Parameter(nn.init.xavier_uniform_(torch.empty(args.inducing_points, 64)))
+            self.anchors3 = nn.Parameter(nn.init.xavier_uniform_(torch.empty(args.inducing_points, 128)))
+        else:
+            self.anchors1 = self.anchors2 = self.anchors3 = None
+
         self.conv1 = nn.Conv1d(3, 64, kernel_size=1, bias=False)
         self.conv2 = nn.Conv1d(64, 64, kernel_size=1, bias=False)
         self.conv3 = nn.Conv1d(64, 64, kernel_size=1, bias=False)
@@ -28,24 +48,21 @@ class PointAttentionNet(nn.Module):
         self.dp1 = nn.Dropout()
         self.linear2 = nn.Linear(512, args.number_classes)
 
-    def perform_att(self, att, x):
+    def perform_att(self, att, x, anchors=None):
         residual = x
-        # print(x.shape)
-
-        x_T = x.transpose(1, 2)
-        x_att, _ = att(x_T,x_T,x_T)
-        x = x_att.transpose(1,2)
-        # x, _ = att(x,x,x)
-
+        x = self_attention(att, x, impl=self.attention_impl, chunk_size=self.attention_chunk, axis=self.attention_axis, anchors=anchors, checkpoint=self.checkpoint_attention, channels_last=self.channels_last)
         return x + residual
 
     def forward(self, x):
-        x = F.relu(self.bn1(self.conv1(x)))
-        x = F.relu(self.bn2(self.perform_att(self.attn1, self.conv2(x))))
-        x = F.relu(self.bn3(self.perform_att(self.attn2, self.conv3(x))))
-        x = F.relu(self.bn4(self.perform_att(self.attn3, self.conv4(x))))
-        x = F.relu(self.bn5(self.conv5(x)))
-        x = F.adaptive_max_pool1d(x, 1).squeeze()
+        ''' x is [B, 3, N], or [B, N, 3] in the channels_last layout where the point features stay
+        [B, N, C] (the attention blocks only take transposed views of them). '''
+        last = self.channels_last
+        x = F.relu(conv_norm(self.conv1, self.bn1, x, channels_last=last))
+        x = F.relu(point_norm(self.bn2, self.perform_att(self.attn1, pointwise_conv(self.conv2, x, channels_last=last), self.anchors1), channels_last=last))
+        x = F.relu(point_norm(self.bn3, self.perform_att(self.attn2, pointwise_conv(self.conv3, x, channels_last=last), self.anchors2), channels_last=last))
+        x = F.relu(point_norm(self.bn4, self.perform_att(self.attn3, pointwise_conv(self.conv4, x, channels_last=last), self.anchors3), channels_last=last))
+        x = F.relu(conv_norm(self.conv5, self.bn5, x, channels_last=last))
+        x = pool_points(x, 'max', channels_last=last)
         x = F.relu(self.bn6(self.linear1(x)))
         x = self.dp1(x)
         x = self.linear2(x)
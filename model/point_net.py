@@ -1,11 +1,15 @@
 import numpy as np
 import torch.nn as nn
 import torch.nn.functional as F
+from utils.utility import conv_norm
+from utils.utility import is_channels_last
+from utils.utility import pool_points
 
 class PointNet(nn.Module):
     def __init__(self, args, output_channels=40):
         super(PointNet, self).__init__()
         self.args = args
+        self.channels_last = is_channels_last(args)
         self.conv1 = nn.Conv1d(3, 64, kernel_size=1, bias=False)
         self.conv2 = nn.Conv1d(64, 64, kernel_size=1, bias=False)
         self.conv3 = nn.Conv1d(64, 64, kernel_size=1, bias=False)
@@ -22,12 +26,14 @@ class PointNet(nn.Module):
         self.linear2 = nn.Linear(512, output_channels)
 
     def forward(self, x):
-        x = F.relu(self.bn1(self.conv1(x)))
-        x = F.relu(self.bn2(self.conv2(x)))
-        x = F.relu(self.bn3(self.conv3(x)))
-        x = F.relu(self.bn4(self.conv4(x)))
-        x = F.relu(self.bn5(self.conv5(x)))
-        x = F.adaptive_max_pool1d(x, 1).squeeze()
+        ''' x is [B, 3, N], or [B, N, 3] in the channels_last layout where the point features stay [B, N, C]. '''
+        last = self.channels_last
+        x = F.relu(conv_norm(self.conv1, self.bn1, x, channels_last=last))
+        x = F.relu(conv_norm(self.conv2, self.bn2, x, channels_last=last))
+        x = F.relu(conv_norm(self.conv3, self.bn3, x, channels_last=last))
+        x = F.relu(conv_norm(self.conv4, self.bn4, x, channels_last=last))
+        x = F.relu(conv_norm(self.conv5, self.bn5, x, channels_last=last))
+        x = pool_points(x, 'max', channels_last=last)
         x = F.relu(self.bn6(self.linear1(x)))
         x = self.dp1(x)
         x = self.linear2(x)
@@ -0,0 +1,128 @@
+import torch
+import torch.nn.functional as F
+from utils.utility import checkpoint_block
+
+def in_projection(att, query, key_value=None):
+    ''' q, k, v of the nn.MultiheadAttention att for batch first [N, L, E] inputs, split in
+    heads as [N, heads, L, head_dim]. key_value defaults to query (self-attention). '''
+
+    embed_dim = att.embed_dim
+    if hasattr(att, 'in_proj'):
+        # utils.quantization.QuantizableMultiheadAttention keeps the input projection as a module
+        q, k, v = att.in_proj(query).chunk(3, dim=-1)
+        if key_value is not None:
+            k, v = att.in_proj(key_value)[..., embed_dim:].chunk(2, dim=-1)
+    elif key_value is None:
+        q, k, v = F.linear(query, att.in_proj_weight, att.in_proj_bias).chunk(3, dim=-1)
+    else:
+        bias = (None, None) if att.in_proj_bias is None else (att.in_proj_bias[:embed_dim], att.in_proj_bias[embed_dim:])
+        q = F.linear(query, att.in_proj_weight[:embed_dim], bias[0])
+        k, v = F.linear(key_value, att.in_proj_weight[embed_dim:], bias[1]).chunk(2, dim=-1)
+
+    return [t.reshape(t.size(0), t.size(1), att.num_heads, -1).transpose(1, 2) for t in (q, k, v)]
+
+def out_projection(att, x):
+    ''' [N, heads, L, head_dim] back to [N, L, E] through the output projection of att. '''
+    batch_size, _, length, _ = x.size()
+    return att.out_proj(x.transpose(1, 2).reshape(batch_size, length, -1))
+
+def multihead_attention(att, query, key_value=None, chunk_size=None):
+    ''' Attention of att on batch first inputs through F.scaled_dot_product_attention, so the
+    attention weights are never returned or stored. With chunk_size the queries are processed
+    chunk_size at a time and only a [N, heads, chunk_size, L] block of scores exists at once. '''
+
+    q, k, v = in_projection(att, query, key_value)
+    dropout = att.dropout if att.training else 0.0
+
+    if chunk_size is None or chunk_size >= q.size(2):
+        x = F.scaled_dot_product_attention(q, k, v, dropout_p=dropout)
+    else:
+        x = torch.cat([F.scaled_dot_product_attention(q[:, :, start:start + chunk_size], k, v, dropout_p=dropout)
+                       for start in range(0, q.size(2), chunk_size)], dim=2)
+
+    return out_projection(att, x)
+
+def linear_attention(att, x):
+    ''' O(L) kernelized self-attention (Katharopoulos et al., feature map elu + 1) with the
+    projections of att: softmax(q k^T) v is replaced by phi(q) (phi(k)^T v), normalized by
+    phi(q) sum(phi(k)), so no L x L matrix is formed. '''
+
+    q, k, v = in_projection(att, x)
+    q, k = F.elu(q) + 1, F.elu(k) + 1
+
+    kv = torch.matmul(k.transpose(-2, -1), v)
+    normalizer = torch.matmul(q, k.sum(dim=2).unsqueeze(-1))
+    x = torch.matmul(q, kv) / normalizer.clamp_min(1e-6)
+
+    return out_projection(att, x)
+
+def inducing_point_attention(att, x, anchors, chunk_size=None):
+    ''' O(L * m) self-attention through m learned anchors (Set Transformer ISAB): the anchors
+    attend to the L inputs, then the inputs attend to the m anchor summaries. Both steps use
+    the projections of att. '''
+
+    anchors = anchors.unsqueeze(0).expand(x.size(0), -1, -1)
+    summary = multihead_attention(att, anchors, x, chunk_size=chunk_size)
+    return multihead_attention(att, x, summary, chunk_size=chunk_size)
+
+def local_attention(att, x, idx):
+    ''' Self-attention of batch first [B, N, E] points where each point only attends to its k
+    neighbors idx [B, N, k], e.g. the graph the EdgeConv block just used: O(N * k) scores
+    instead of O(N^2). '''
+
+    q, k, v = in_projection(att, x)
+    batch_size, num_heads, num_points, head_dim = q.size()
+    num_neighbors = idx.size(-1)
+
+    index = idx.reshape(batch_size, 1, num_points*num_neighbors, 1).expand(-1, num_heads, -1, head_dim)
+    k = k.gather(2, index).view(batch_size, num_heads, num_points, num_neighbors, head_dim)
+    v = v.gather(2, index).view(batch_size, num_heads, num_points, num_neighbors, head_dim)
+
+    scores = torch.matmul(k, q.unsqueeze(-1)).squeeze(-1) / head_dim**0.5
+    weights = F.dropout(scores.softmax(dim=-1), p=att.dropout, training=att.training)
+    x = torch.matmul(weights.unsqueeze(-2), v).squeeze(-2)
+
+    return out_projection(att, x)
+
+def self_attention(att, x, impl='native', chunk_size=None, axis='batch', anchors=None, idx=None, checkpoint=False, channels_last=False):
+    ''' Attention block of PointAttentionNet and AttentionDGCNN on [B, C, N] features. axis='batch'
+    attends over the clouds of the batch as the published checkpoints do, 'points' (always used by
+    'linear' and 'inducing') over the points of each cloud and 'local' over the neighbors idx. '''
+
+    if channels_last:
+        x = self_attention(att, x.transpose(1, 2), impl=impl, chunk_size=chunk_size, axis=axis, anchors=anchors, idx=idx, checkpoint=checkpoint)
+        return x.transpose(1, 2)
+
+    if checkpoint:
+        return checkpoint_block(lambda x: self_attention(att, x, impl=impl, chunk_size=chunk_size, axis=axis, anchors=anchors, idx=idx), att, x)
+
+    if impl == 'local':
+        if idx is None:
+            raise ValueError("attention_impl 'local' needs the kNN graph of the EdgeConv block")
+        return local_attention(att, x.transpose(1, 2), idx).transpose(1, 2)
+
+    if impl in ('linear', 'inducing'):
+        axis = 'points'
+
+    if axis == 'points':
+        x = x.transpose(1, 2)
+    elif axis == 'batch':
+        x = x.permute(2, 0, 1)
+    else:
+        raise ValueError(f'Unknown attention_axis: {axis}')
+
+    if impl == 'native':
+        x = x.transpose(0, 1)
+        x = att(x, x, x, need_weights=False)[0].transpose(0, 1)
+    elif impl == 'fused':
+        x = multihead_attention(att, x, chunk_size=chunk_size)
+    elif impl == 'linear':
+        x = linear_attention(att, x)
+    elif impl == 'inducing':
+        if anchors is None:
+            raise ValueError("attention_impl 'inducing' needs the anchors of the model")
+        x = inducing_point_attention(att, x, anchors, chunk_size=chunk_size)
+    else:
+        raise ValueError(f'Unknown attention_impl: {impl}')
+
+    return x.transpose(1, 2) if axis == 'points' else x.permute(1, 2, 0)
@@ -0,0 +1,45 @@
+import copy
+import torch
+import torch.nn as nn
+
+# (layer, BatchNorm) pairs of each model where the BatchNorm directly follows the layer.
+# In the DGCNN family the layer is the Sequential(conv, bn, activation) and the BatchNorm
+# is its second module. bn2..bn4 of PointAttentionNet normalize the attention output and
+# can not be folded.
+FOLDABLE_LAYERS = {
+    'PointNet': [('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3'), ('conv4', 'bn4'), ('conv5', 'bn5'), ('linear1', 'bn6')],
+    'PointAttentionNet': [('conv1', 'bn1'), ('conv5', 'bn5'), ('linear1', 'bn6')],
+    'DGCNN': [('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3'), ('conv4', 'bn4'), ('conv5', 'bn5'), ('linear1', 'bn6'), ('linear2', 'bn7')],
+    'AttentionDGCNN': [('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3'), ('conv4', 'bn4'), ('conv5', 'bn5'), ('linear1', 'bn6'), ('linear2', 'bn7')],
+}
+
+def fold_batch_norm(layer, bn):
+    ''' Copy of a Linear or Conv layer followed by an eval mode BatchNorm as a single layer:
+    W' = W * gamma / sqrt(var + eps), b' = (b - mean) * gamma / sqrt(var + eps) + beta. '''
+    scale = torch.rsqrt(bn.running_var + bn.eps)
+    if bn.affine:
+        scale = scale*bn.weight.detach()
+    bias = -bn.running_mean if layer.bias is None else layer.bias.detach() - bn.running_mean
+    bias = bias*scale
+    if bn.affine:
+        bias = bias + bn.bias.detach()
+
+    folded = copy.deepcopy(layer)
+    folded.weight = nn.Parameter(layer.weight.detach()*scale.view(-1, *[1]*(layer.weight.dim() - 1)))
+    folded.bias = nn.Parameter(bias)
+    return folded
+
+def optimize_for_inference(model):
+    ''' Eval mode copy of model with every BatchNorm of FOLDABLE_LAYERS folded into the
+    preceding conv/linear layer and replaced with nn.Identity. The logits match the
+    original model in eval mode up to floating point rounding. '''
+    model = copy.deepcopy(model).eval()
+    for layer_name, bn_name in FOLDABLE_LAYERS[type(model).__name__]:
+        layer = getattr(model, layer_name)
+        if isinstance(layer, nn.Sequential):
+            layer[0] = fold_batch_norm(layer[0], layer[1])
+            layer[1] = nn.Identity()
+        else:
+            setattr(model, layer_name, fold_batch_norm(layer, getattr(model, bn_name)))
+        setattr(model, bn_name, nn.Identity())
+    return model
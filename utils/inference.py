@@ -0,0 +1,25 @@
+import numpy as np
+import onnxruntime as ort
+import torch
+
+class OnnxInferenceEngine:
+    ''' Runs a model exported by `export.py onnx` with ONNX Runtime on CPU. 0 threads lets
+    ONNX Runtime choose; more than one inter-op thread runs independent nodes in parallel. '''
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0):
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, points):
+        ''' Logits for [B, 3, N] points, given as a numpy array or a torch tensor. '''
+        if isinstance(points, torch.Tensor):
+            points = points.detach().cpu().numpy()
+        points = np.ascontiguousarray(points, dtype=np.float32)
+        return self.session.run(None, {self.input_name: points})[0]
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import torch
+
+from utils.utility import knn
+
+class KnnGraphCache:
+    ''' Neighbor indices of the first (xyz) EdgeConv layer for every cloud of a partition,
+    stored on disk as a memory-mapped int32 array of shape [len, num_points, k]. Only
+    partitions that are never augmented can be cached. '''
+
+    def __init__(self, dataset, k, cache_dir='./tmp/data/knn_cache', batch_size=64):
+        if dataset.partition == 'train':
+            raise ValueError('The train partition is augmented, its kNN graph can not be cached')
+
+        num_points = dataset.data[:, :dataset.num_points].shape[1]
+        self.shape = (len(dataset), num_points, k)
+        self.path = os.path.join(cache_dir, f'{dataset.partition}_{dataset.random_state}_{num_points}_{k}.int32')
+
+        if not os.path.exists(self.path):
+            self.build(dataset, k, batch_size)
+
+        self.idx = np.memmap(self.path, dtype=np.int32, mode='r', shape=self.shape)
+
+    def build(self, dataset, k, batch_size):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+
+        try:
+            idx = np.memmap(tmp_path, dtype=np.int32, mode='w+', shape=self.shape)
+            with torch.no_grad():
+                for start in range(0, len(dataset), batch_size):
+                    end = min(start + batch_size, len(dataset))
+                    # The raw clouds, the dataset is still being built and is never augmented here
+                    clouds = torch.from_numpy(np.ascontiguousarray(dataset.data[start:end, :dataset.num_points]))
+                    idx[start:end] = knn(clouds.transpose(2, 1), k=k).numpy()
+            idx.flush()
+            del idx
+
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __getitem__(self, item):
+        return np.array(self.idx[item])
+
+    def __len__(self):
+        return self.shape[0]
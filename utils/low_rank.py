@@ -0,0 +1,47 @@
+import torch
+import torch.nn as nn
+
+def svd_rank(singular_values, rank=None, energy=None):
+    ''' rank as given, or the smallest rank that keeps `energy` of the sum of the squared
+    singular values. '''
+    if rank is not None:
+        return min(rank, len(singular_values))
+    cumulative = (singular_values**2).cumsum(dim=0) / (singular_values**2).sum()
+    return min(int((cumulative < energy).sum()) + 1, len(singular_values))
+
+def factorize(layer, rank=None, energy=None):
+    ''' Truncated SVD of a Linear or 1x1 Conv1d/Conv2d W [out, in] as a Sequential of two
+    layers of the same type, (U S^1/2) after (S^1/2 V^T), which costs rank*(in + out)
+    instead of in*out multiply-accumulates per point. The bias goes to the second layer. '''
+    weight = layer.weight.detach()
+    out_channels, in_channels = weight.size(0), weight[0].numel()
+
+    U, S, Vh = torch.linalg.svd(weight.view(out_channels, in_channels), full_matrices=False)
+    rank = svd_rank(S, rank=rank, energy=energy)
+    root = S[:rank].sqrt()
+    first_weight = root.unsqueeze(1)*Vh[:rank]
+    second_weight = U[:, :rank]*root
+
+    if isinstance(layer, nn.Linear):
+        first = nn.Linear(in_channels, rank, bias=False)
+        second = nn.Linear(rank, out_channels, bias=layer.bias is not None)
+    else:
+        first = type(layer)(in_channels, rank, kernel_size=1, bias=False)
+        second = type(layer)(rank, out_channels, kernel_size=1, bias=layer.bias is not None)
+    first.weight.data.copy_(first_weight.view_as(first.weight))
+    second.weight.data.copy_(second_weight.view_as(second.weight))
+    if layer.bias is not None:
+        second.bias.data.copy_(layer.bias.detach())
+
+    return nn.Sequential(first, second).to(weight.device)
+
+def factorize_model(model, layers=('conv5', 'linear1'), rank=None, energy=None):
+    ''' Replaces the named layers of model (in place) with their factorize() pairs. conv5
+    of the DGCNN family is the first module of its Sequential(conv, bn, activation). '''
+    for name in layers:
+        module = getattr(model, name)
+        if isinstance(module, nn.Sequential):
+            module[0] = factorize(module[0], rank=rank, energy=energy)
+        else:
+            setattr(model, name, factorize(module, rank=rank, energy=energy))
+    return model
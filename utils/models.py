@@ -0,0 +1,64 @@
+import ast
+import copy
+import torch
+import torch.nn as nn
+
+from model.attention_dgcnn import AttentionDGCNN
+from model.dgcnn import DGCNN
+from model.point_attention_net import PointAttentionNet
+from model.point_net import PointNet
+from utils.params import Params
+from utils.utility import is_channels_last
+from utils.utility import load_checkpoint
+
+MODELS = {model.__name__: model for model in [PointNet, PointAttentionNet, DGCNN, AttentionDGCNN]}
+
+def parse_value(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+def add_model_arguments(parser):
+    parser.add_argument('--model', required=True, choices=MODELS.keys())
+    parser.add_argument('--checkpoint', required=True, help='best_model.t7 saved by train()')
+    parser.add_argument('--num_points', type=int, default=1024)
+    parser.add_argument('--batch_size', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE', help='Params override')
+
+def build_model(args):
+    ''' The checkpoint's model in eval mode on CPU. '''
+    overrides = dict(setting.split('=', 1) for setting in args.set)
+    overrides = {name: parse_value(value) for name, value in overrides.items()}
+    params = Params(model=MODELS[args.model], device='cpu', num_points=args.num_points, dump_file=False, **overrides)
+
+    model = params.model(params)
+    model.load_state_dict(load_checkpoint(args.checkpoint))
+    return model.eval()
+
+def random_clouds(args, batch_size):
+    ''' Random input of the model built with args: [batch_size, 3, num_points] clouds, or
+    [batch_size, num_points, 3] in the channels_last layout. '''
+    if is_channels_last(args):
+        return torch.rand(batch_size, args.num_points, 3)
+    return torch.rand(batch_size, 3, args.num_points)
+
+def forward_flops(model, num_points):
+    ''' FLOPs per cloud (2 per multiply-accumulate) of the fp32 conv and linear layers of
+    model. The kNN search, attention scores and pooling are not counted. '''
+    if model.channels_last: # its convs run as F.linear, which the hooks do not see
+        model = copy.deepcopy(model)
+        model.channels_last = False
+
+    flops = []
+    def count(module, inputs, output):
+        flops.append(2*output.numel()*module.weight[0].numel())
+
+    handles = [module.register_forward_hook(count) for module in model.modules() if isinstance(module, (nn.Linear, nn.Conv1d, nn.Conv2d))]
+    model.eval()
+    with torch.no_grad():
+        model(torch.rand(1, 3, num_points))
+    for handle in handles:
+        handle.remove()
+    return sum(flops)
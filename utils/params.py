@@ -17,11 +17,39 @@ class Params:
         self.num_points=1024
         self.emb_dims=1024 #Dimension of embeddings
         self.k=20 #Num of nearest neighbors to use
+        self.knn_tile_size=None #Block size of the tiled knn, None computes the full N x N distance matrix
+        self.knn_precision='fp32' #'bf16' computes the dense knn distances in bfloat16 and re-ranks the candidates in fp32
+        self.knn_rerank_margin=None #Extra bf16 candidates re-ranked in fp32, None uses k
+        self.xyz_knn_backend='dense' #Neighbor search of the first EdgeConv layer: 'dense', 'kdtree' (CPU only), 'grid' or 'auto'
+        self.grid_radius=None #Ball query radius of the 'grid' backend, None searches the k nearest neighbors
+        self.grid_min_points=4096 #'auto' uses the 'grid' backend from this many points on, 'dense' below
+        self.grid_max_per_cell=64 #Largest voxel occupancy of the 'grid' backend, above it the search falls back to the tiled dense knn (None: unbounded)
+        self.knn_reuse='none' #'none' recomputes the graph in every EdgeConv layer, 'xyz' reuses the xyz graph everywhere, 'group' recomputes every knn_reuse_group layers
+        self.knn_reuse_group=2
+        self.feature_knn_backend='dense' #Neighbor search of the feature-space EdgeConv layers: 'dense' or 'lsh' (approximate)
+        self.lsh_tables=4 #Hash tables of the 'lsh' backend, more tables give a higher recall
+        self.lsh_window=None #Candidates compared per point and table by the 'lsh' backend, None uses 2*k
+        self.edge_conv_mode='dense' #'dense' builds the [B, 2C, N, k] edge tensor, 'decomposed' convolves the point features before gathering, 'fused' also skips the [B, C_out, N, k] activation
+        self.edge_conv_chunk=4 #Neighbors processed at a time by the 'fused' EdgeConv
+        self.layout='channels_first' #'channels_last' keeps the point features as [B, N, C] and runs the 1x1 convs as Linear GEMMs, the models then take [B, N, 3] clouds
+        self.activation_checkpoint='none' #'edge_conv' recomputes the activations of the EdgeConv blocks during backward instead of storing them, 'all' also those of the attention blocks
+        self.knn_cache=False #DGCNN family: read the xyz kNN graph of the validation/test partitions from a memory-mapped disk cache
+        self.precision='fp32' #'bf16' runs the forward passes of train() and test() under bfloat16 autocast, the knn search and the loss stay fp32
         self.optimizer='ADAM'
         self.lr=0.0001# learning rate (default: Adam=0.001, SGD=0.1)
         self.momentum=0.9
         self.dropout=0.5
         self.att_heads=8
+        self.attention_impl='native' #'native' calls nn.MultiheadAttention, 'fused' runs scaled_dot_product_attention without attention weights, 'linear' and 'inducing' (PointAttentionNet) are sub-quadratic, 'local' (AttentionDGCNN) attends to the EdgeConv neighbors
+        self.inducing_points=32 #Anchors of the 'inducing' attention
+        self.attention_axis='batch' #'points' attends over the points of each cloud, 'batch' over the clouds of the batch as the published checkpoints do ('native' and 'fused' only, the other impls always attend over the points)
+        self.attention_chunk=None #Queries per block of the 'fused' attention, None attends with all at once
+        self.teacher=None #Distillation: frozen teacher model class, built with these Params, None trains without a teacher
+        self.teacher_checkpoint=None #Checkpoint of the teacher
+        self.teacher_params={} #Params overrides of the teacher, e.g. {'emb_dims': 1024, 'attention_impl': 'native'}, its layout and device stay these
+        self.distill_alpha=0.5 #Weight of the KL term of the distillation loss, 1 - distill_alpha weights calculate_loss
+        self.distill_temperature=4.0 #Softmax temperature of the distillation KL term
+        self.teacher_cache=False #Compute the teacher logits of the train partition once, without augmentation, and read them from a memory-mapped disk cache
 
         ## Logging and history
         self.save_checkpoint=True
@@ -104,8 +132,8 @@ class Params:
 
             with open(self.csv_path(), "a") as f:
                 if print_header:
-                    f.write("epoch,train_loss,train_acc,train_avg_acc,validation_loss,validation_acc,validation_avg_acc,time\n")
-                f.write(f'{epoch}, {train_loss}, {train_acc}, {train_avg_acc}, {validation_loss}, {validation_acc}, {validation_avg_acc}, {time}')
+                    f.write("epoch,train_loss,train_acc,train_avg_acc,validation_loss,validation_acc,validation_avg_acc,time,precision\n")
+                f.write(f'{epoch}, {train_loss}, {train_acc}, {train_avg_acc}, {validation_loss}, {validation_acc}, {validation_avg_acc}, {time}, {self.precision}')
                 f.write('\n')
 
     def print_summary(self, validation_loss, validation_acc, validation_avg_acc):
@@ -0,0 +1,90 @@
+import copy
+import torch
+import torch.nn as nn
+
+from model.dgcnn import DGCNN
+
+def kept_channels(bn, ratio):
+    ''' Sorted indices of the output channels that survive removing `ratio` of them, the
+    channels with the smallest BatchNorm |gamma| being removed first. '''
+    num_kept = max(1, int(round(bn.num_features*(1 - ratio))))
+    return bn.weight.detach().abs().argsort(descending=True)[:num_kept].sort().values
+
+def select_channels(layer, out_idx=None, in_idx=None):
+    ''' Smaller copy of a Linear or 1x1 Conv1d/Conv2d with only the out_idx output and
+    in_idx input channels (None keeps all of them). '''
+    weight = layer.weight.detach()
+    bias = None if layer.bias is None else layer.bias.detach()
+    if out_idx is not None:
+        weight = weight[out_idx]
+        bias = None if bias is None else bias[out_idx]
+    if in_idx is not None:
+        weight = weight[:, in_idx]
+
+    if isinstance(layer, nn.Linear):
+        pruned = nn.Linear(weight.size(1), weight.size(0), bias=bias is not None)
+    else:
+        pruned = type(layer)(weight.size(1), weight.size(0), kernel_size=layer.kernel_size, bias=bias is not None)
+    pruned.weight.data.copy_(weight)
+    if bias is not None:
+        pruned.bias.data.copy_(bias)
+    return pruned.to(layer.weight.device)
+
+def select_bn(bn, idx):
+    ''' Copy of a BatchNorm1d/2d with only the idx channels. '''
+    pruned = type(bn)(len(idx), eps=bn.eps, momentum=bn.momentum, affine=bn.affine, track_running_stats=bn.track_running_stats)
+    if bn.affine:
+        pruned.weight.data.copy_(bn.weight.detach()[idx])
+        pruned.bias.data.copy_(bn.bias.detach()[idx])
+    if bn.track_running_stats:
+        pruned.running_mean.copy_(bn.running_mean[idx])
+        pruned.running_var.copy_(bn.running_var[idx])
+        pruned.num_batches_tracked.copy_(bn.num_batches_tracked)
+    return pruned.to(bn.weight.device)
+
+def prune_edge_convs(model, ratio):
+    ''' Removes `ratio` of the output channels of conv1..conv4 of a DGCNN, together with
+    the matching (x_j - x_i, x_i) input channels of the next EdgeConv and conv5 inputs. '''
+    in_idx = None
+    concatenated, offset = [], 0
+    for layer in range(1, 5):
+        conv = getattr(model, f'conv{layer}')
+        bn = conv[1]
+        kept = kept_channels(bn, ratio)
+
+        conv[0] = select_channels(conv[0], out_idx=kept, in_idx=in_idx)
+        conv[1] = select_bn(bn, kept)
+        setattr(model, f'bn{layer}', conv[1])
+
+        in_idx = torch.cat((kept, kept + bn.num_features))
+        concatenated.append(kept + offset)
+        offset += bn.num_features
+
+    model.conv5[0] = select_channels(model.conv5[0], in_idx=torch.cat(concatenated))
+
+def prune_conv5(model, ratio):
+    ''' Removes `ratio` of the emb_dims output channels of conv5 and the matching linear1
+    inputs (max and average pooled in the DGCNN family, max pooled in the PointNet family). '''
+    kept = kept_channels(model.bn5, ratio)
+    bn5 = select_bn(model.bn5, kept)
+
+    if isinstance(model.conv5, nn.Sequential):
+        model.conv5[0] = select_channels(model.conv5[0], out_idx=kept)
+        model.conv5[1] = bn5
+        in_idx = torch.cat((kept, kept + model.bn5.num_features))
+    else:
+        model.conv5 = select_channels(model.conv5, out_idx=kept)
+        in_idx = kept
+
+    model.bn5 = bn5
+    model.linear1 = select_channels(model.linear1, in_idx=in_idx)
+
+def prune_model(model, ratio):
+    ''' Physically smaller copy of model with `ratio` of the conv5 channels removed and, for
+    DGCNN, `ratio` of the channels of each EdgeConv. AttentionDGCNN keeps its EdgeConv
+    widths, which are also the embedding size of its attention blocks. '''
+    model = copy.deepcopy(model)
+    if isinstance(model, DGCNN):
+        prune_edge_convs(model, ratio)
+    prune_conv5(model, ratio)
+    return model
@@ -0,0 +1,118 @@
+import copy
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization import quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx
+from torch.ao.quantization.quantize_fx import prepare_fx
+
+from utils.attention import multihead_attention
+
+class PointwiseLinear(nn.Module):
+    ''' A kernel_size=1 Conv1d/Conv2d as an nn.Linear over the channel axis (dim 1), which
+    is the form dynamic quantization supports. '''
+
+    def __init__(self, conv):
+        super(PointwiseLinear, self).__init__()
+        if any(size != 1 for size in conv.kernel_size) or conv.groups != 1:
+            raise ValueError(f'Only ungrouped 1x1 convolutions can run as a Linear: {conv}')
+
+        self.linear = nn.Linear(conv.in_channels, conv.out_channels, bias=conv.bias is not None)
+        self.linear.weight.data.copy_(conv.weight.data.view(conv.out_channels, conv.in_channels))
+        if conv.bias is not None:
+            self.linear.bias.data.copy_(conv.bias.data)
+
+    def forward(self, x):
+        return self.linear(x.movedim(1, -1)).movedim(-1, 1)
+
+class QuantizableMultiheadAttention(nn.Module):
+    ''' nn.MultiheadAttention with the packed q, k, v input projection as an nn.Linear, so
+    both of its projections can be quantized. utils.attention uses it like the original. '''
+
+    def __init__(self, att):
+        super(QuantizableMultiheadAttention, self).__init__()
+        if not att._qkv_same_embed_dim or att.bias_k is not None or att.add_zero_attn:
+            raise ValueError('Only self-attention without bias_k/add_zero_attn can be converted')
+
+        self.embed_dim = att.embed_dim
+        self.num_heads = att.num_heads
+        self.dropout = att.dropout
+        self.batch_first = att.batch_first
+
+        self.in_proj = nn.Linear(att.embed_dim, 3*att.embed_dim, bias=att.in_proj_bias is not None)
+        self.in_proj.weight.data.copy_(att.in_proj_weight.data)
+        if att.in_proj_bias is not None:
+            self.in_proj.bias.data.copy_(att.in_proj_bias.data)
+
+        self.out_proj = nn.Linear(att.embed_dim, att.embed_dim, bias=att.out_proj.bias is not None)
+        self.out_proj.weight.data.copy_(att.out_proj.weight.data)
+        if att.out_proj.bias is not None:
+            self.out_proj.bias.data.copy_(att.out_proj.bias.data)
+
+    def forward(self, query, key, value, need_weights=False):
+        ''' Self-attention of query, called as att(x, x, x) like nn.MultiheadAttention. '''
+        if need_weights:
+            raise ValueError('QuantizableMultiheadAttention does not return attention weights')
+
+        x = query if self.batch_first else query.transpose(0, 1)
+        x = multihead_attention(self, x)
+        return (x if self.batch_first else x.transpose(0, 1)), None
+
+def pointwise_as_linear(model):
+    ''' Replaces the 1x1 convs and the nn.MultiheadAttention modules of model in place. '''
+    for name, module in model.named_children():
+        if isinstance(module, (nn.Conv1d, nn.Conv2d)):
+            setattr(model, name, PointwiseLinear(module))
+        elif isinstance(module, nn.MultiheadAttention):
+            setattr(model, name, QuantizableMultiheadAttention(module))
+        else:
+            pointwise_as_linear(module)
+    return model
+
+def dynamic_quantize(model):
+    ''' INT8 copy of an fp32 model for CPU inference: the weights of every 1x1 conv, linear
+    layer and attention projection are quantized ahead of time, their inputs per batch.
+    BatchNorm and the activations stay fp32. EdgeConv blocks run in 'dense' mode, since
+    'decomposed' and 'fused' read the conv weight directly. '''
+
+    model = pointwise_as_linear(copy.deepcopy(model).eval())
+    if hasattr(model, 'edge_conv_mode'):
+        model.edge_conv_mode = 'dense'
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+class PointsOnly(nn.Module):
+    ''' model(x) without the optional idx argument, so torch.fx traces the idx=None path. '''
+
+    def __init__(self, model):
+        super(PointsOnly, self).__init__()
+        self.model = model
+
+    def forward(self, x):
+        return self.model(x)
+
+def static_quantize(model, calibration_loader, num_batches=None, backend='x86'):
+    ''' Post-training static INT8 copy of an fp32 model built with torch.fx and calibrated on
+    num_batches batches of calibration_loader (None for all), the kNN and attention stay fp32. '''
+
+    if model.channels_last:
+        raise ValueError("Static quantization traces the channels_first convs, build the model with layout='channels_first'")
+
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).eval()
+    if hasattr(model, 'edge_conv_mode'):
+        model.edge_conv_mode = 'dense'
+
+    example = next(iter(calibration_loader))[0].permute(0, 2, 1)
+    prepared = prepare_fx(PointsOnly(model), get_default_qconfig_mapping(backend), example_inputs=(example,))
+
+    with torch.no_grad():
+        for batch_index, batch in enumerate(calibration_loader):
+            if num_batches is not None and batch_index >= num_batches:
+                break
+            prepared(batch[0].permute(0, 2, 1))
+
+    quantized = convert_fx(prepared)
+    # test() must not pass the cached kNN graph to the x only forward
+    quantized.args = copy.copy(model.args)
+    quantized.args.knn_cache = False
+    return quantized
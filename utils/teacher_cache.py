@@ -0,0 +1,54 @@
+import os
+import hashlib
+import numpy as np
+import torch
+
+from torch.utils.data import Dataset
+
+# Params that do not change the teacher logits, left out of the cache key
+RUN_SETTINGS = ('device', 'epochs', 'lr', 'momentum', 'optimizer', 'batch_size', 'test_batch_size', 'num_workers',
+                'save_checkpoint', 'dump_file', 'dry_ryn', 'eval', 'output_dir', 'execution_id', 'layout', 'precision',
+                'activation_checkpoint', 'knn_cache', 'teacher', 'teacher_checkpoint', 'teacher_params', 'teacher_cache',
+                'distill_alpha', 'distill_temperature')
+
+class TeacherLogitsCache(Dataset):
+    ''' dataset with the logits of a distillation teacher appended to every sample. The
+    logits are computed once, on the clouds without augmentation, and stored on disk as a
+    memory-mapped float32 array of shape [len, number_classes], keyed by the checkpoint and
+    the teacher's Params. '''
+
+    def __init__(self, dataset, teacher, checkpoint, number_classes, device='cpu', cache_dir='./tmp/data/teacher_cache', batch_size=64):
+        self.dataset = dataset
+        self.shape = (len(dataset), number_classes)
+
+        checkpoint = os.path.abspath(checkpoint)
+        settings = sorted((name, value) for name, value in vars(teacher.args).items() if name not in RUN_SETTINGS)
+        key = hashlib.sha1(f'{checkpoint}:{os.path.getmtime(checkpoint)}:{settings}'.encode()).hexdigest()[:12]
+        self.path = os.path.join(cache_dir, f'{type(teacher).__name__}_{key}_{dataset.partition}_{dataset.random_state}_{dataset.num_points}.float32')
+
+        if not os.path.exists(self.path):
+            self.build(teacher, device, batch_size)
+
+        self.logits = np.memmap(self.path, dtype=np.float32, mode='r', shape=self.shape)
+
+    def build(self, teacher, device, batch_size):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+
+        logits = np.memmap(tmp_path, dtype=np.float32, mode='w+', shape=self.shape)
+        with torch.no_grad():
+            for start in range(0, len(self.dataset), batch_size):
+                end = min(start + batch_size, len(self.dataset))
+                clouds = torch.from_numpy(self.dataset.data[start:end, :self.dataset.num_points]).to(device)
+                clouds = clouds if teacher.channels_last else clouds.transpose(2, 1)
+                logits[start:end] = teacher(clouds).float().cpu().numpy()
+        logits.flush()
+        del logits
+
+        os.replace(tmp_path, self.path)
+
+    def __getitem__(self, item):
+        return self.dataset[item] + (np.array(self.logits[item]),)
+
+    def __len__(self):
+        return self.shape[0]
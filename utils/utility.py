@@ -1,6 +1,10 @@
+import time
 import numpy as np
 import torch
+import torch.fx
+import torch.utils.checkpoint
 import torch.nn.functional as F
+from scipy.spatial import cKDTree
 
 
 def calculate_loss(pred, gold, smoothing=True):
@@ -22,7 +26,45 @@ def calculate_loss(pred, gold, smoothing=True):
 
     return loss
 
-def knn(x, k):
+def distillation_loss(pred, gold, teacher_pred, alpha=0.5, temperature=4.0, smoothing=True):
+    ''' Knowledge distillation loss (Hinton et al.): (1 - alpha) * calculate_loss plus alpha * T^2 *
+    KL(softmax(teacher_pred/T) || softmax(pred/T)). '''
+
+    soft = F.kl_div(F.log_softmax(pred/temperature, dim=1), F.log_softmax(teacher_pred/temperature, dim=1),
+                    reduction='batchmean', log_target=True)
+    return (1 - alpha)*calculate_loss(pred, gold, smoothing) + alpha*temperature**2*soft
+
+def autocast(args):
+    ''' Context of the model forward passes: bfloat16 autocast when Params.precision is 'bf16'. '''
+
+    if args.precision not in ('fp32', 'bf16'):
+        raise ValueError(f'Unknown precision: {args.precision}')
+    return torch.autocast(torch.device(args.device).type, dtype=torch.bfloat16, enabled=args.precision == 'bf16')
+
+def load_checkpoint(path, device='cpu'):
+    ''' State dict of a checkpoint saved by train(), without the nn.DataParallel "module." prefix. '''
+
+    state_dict = torch.load(path, map_location=device)
+    return {key[len('module.'):] if key.startswith('module.') else key: value for key, value in state_dict.items()}
+
+def measure(fn, repeat=5, warmup=1):
+    ''' Average wall time of fn() in seconds. '''
+    for _ in range(warmup):
+        fn()
+    ts = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - ts) / repeat
+
+def knn(x, k, tile_size=None, precision='fp32', rerank_margin=None):
+    if precision == 'bf16':
+        return bf16_knn(x, k, tile_size=tile_size, margin=rerank_margin)
+    if precision != 'fp32':
+        raise ValueError(f'Unknown knn_precision: {precision}')
+
+    if tile_size is not None and tile_size < x.size(2):
+        return tiled_knn(x, k, tile_size)
+
     inner = -2*torch.matmul(x.transpose(2, 1), x)
     xx = torch.sum(x**2, dim=1, keepdim=True)
     pairwise_distance = -xx - inner - xx.transpose(2, 1)
@@ -30,13 +72,260 @@ def knn(x, k):
     idx = pairwise_distance.topk(k=k, dim=-1)[1]
     return idx
 
-def get_graph_feature(x, k=20, idx=None):
+def tiled_knn(x, k, tile_size):
+    ''' Same neighbors as knn(), but only a [B, tile_size, tile_size + k] block of
+    distances is alive at a time: query blocks are scanned against key blocks while
+    a running top-k is kept per query. '''
+
+    batch_size, _, num_points = x.size()
+    xx = torch.sum(x**2, dim=1, keepdim=True)
+
+    idx = []
+    for q_start in range(0, num_points, tile_size):
+        query = x[:, :, q_start:q_start + tile_size]
+        query_xx = xx[:, :, q_start:q_start + tile_size].transpose(2, 1)
+
+        best_distance, best_idx = None, None
+        for k_start in range(0, num_points, tile_size):
+            keys = x[:, :, k_start:k_start + tile_size]
+            inner = -2*torch.matmul(query.transpose(2, 1), keys)
+            pairwise_distance = -xx[:, :, k_start:k_start + tile_size] - inner - query_xx
+
+            candidates = torch.arange(k_start, k_start + keys.size(2), device=x.device)
+            candidates = candidates.view(1, 1, -1).expand(batch_size, query.size(2), -1)
+            if best_distance is not None:
+                pairwise_distance = torch.cat((best_distance, pairwise_distance), dim=-1)
+                candidates = torch.cat((best_idx, candidates), dim=-1)
+
+            best_distance, position = pairwise_distance.topk(k=min(k, pairwise_distance.size(-1)), dim=-1)
+            best_idx = candidates.gather(-1, position)
+
+        idx.append(best_idx)
+
+    return torch.cat(idx, dim=1)
+
+def bf16_knn(x, k, tile_size=None, margin=None, chunk_size=8):
+    ''' knn() with the distance GEMM in bfloat16, which runs on AMX / AVX512-BF16 on recent
+    Xeons. The k + margin best bf16 candidates (margin defaults to k) are re-ranked with fp32
+    distances, so the neighbors match the fp32 knn() unless a true neighbor was pushed
+    behind more than margin candidates by bf16 rounding. '''
+
+    x = x.detach()
+    margin = k if margin is None else margin
+    candidates = knn(x.bfloat16(), k=min(k + margin, x.size(2)), tile_size=tile_size)
+
+    # -|x_i - x_j|^2 up to the per query constant |x_i|^2
+    distance = []
+    for start in range(0, candidates.size(-1), chunk_size):
+        chunk = candidates[:, :, start:start + chunk_size]
+        neighbors = gather_neighbors(x, chunk)
+        distance.append(2*(neighbors*x.unsqueeze(-1)).sum(dim=1) - (neighbors**2).sum(dim=1))
+    distance = torch.cat(distance, dim=-1)
+
+    position = distance.topk(k=k, dim=-1)[1]
+    return candidates.gather(-1, position)
+
+def kdtree_knn(x, k, workers=-1):
+    ''' knn() for the [B, 3, N] xyz input on CPU: one KD-tree per cloud, queried
+    with `workers` threads (-1 uses every core). '''
+
+    points = x.detach().transpose(2, 1).cpu().numpy()
+    idx = np.stack([cKDTree(cloud).query(cloud, k=k, workers=workers)[1].reshape(-1, k) for cloud in points])
+    return torch.from_numpy(idx).to(device=x.device, dtype=torch.long)
+
+def grid_knn(x, k, radius=None, tile_size=None, max_per_cell=64, quantile=0.9, sample_size=64):
+    ''' Neighbor search for the [B, 3, N] xyz input that only scans the 3x3x3 voxels around each
+    point: a ball query capped at k with a radius, the k nearest neighbors without one. '''
+
+    x = x.detach()
+    batch_size, _, num_points = x.size()
+    tile_size = tile_size or 4096
+    points = x.transpose(2, 1).contiguous()
+
+    if radius is None:
+        generator = torch.Generator().manual_seed(0)
+        sample = points[:, torch.randperm(num_points, generator=generator)[:sample_size].to(x.device)]
+        kth_distance = torch.cdist(sample, points).topk(k=k, dim=-1, largest=False)[0][..., -1]
+        cell = torch.quantile(kth_distance, quantile, dim=1)
+    else:
+        cell = x.new_full((batch_size,), radius)
+    # At most 1024 voxels per axis keeps the hash keys far from overflowing
+    lower = points.min(dim=1, keepdim=True)[0]
+    extent = (points.max(dim=1, keepdim=True)[0] - lower).amax(dim=-1).view(-1)
+    cell = torch.maximum(cell, extent / 1024).clamp_min(1e-6).view(-1, 1, 1)
+
+    # Voxel coordinates start at 1 so that the neighbor voxels of any point stay inside the grid
+    voxel = ((points - lower) / cell).long() + 1
+    grid = int(voxel.max()) + 2
+    keys = (voxel[..., 0]*grid + voxel[..., 1])*grid + voxel[..., 2]
+    keys = (keys + torch.arange(batch_size, device=x.device).view(-1, 1)*grid**3).view(-1)
+    sorted_keys, order = keys.sort()
+
+    cap = int(torch.unique_consecutive(sorted_keys, return_counts=True)[1].max())
+    if max_per_cell is not None and cap > max_per_cell:
+        if radius is None:
+            return knn(x, k, tile_size=tile_size)
+        cap = max_per_cell
+    cap = max(cap, -(-k // 27))
+    slots = torch.arange(cap, device=x.device)
+
+    shifts = torch.tensor([-1, 0, 1], device=x.device)
+    key_offsets = ((shifts.view(-1, 1, 1)*grid + shifts.view(1, -1, 1))*grid + shifts.view(1, 1, -1)).view(-1)
+
+    flat_points = points.view(-1, 3)
+    total = flat_points.size(0)
+    idx = []
+    for start in range(0, total, tile_size):
+        end = min(start + tile_size, total)
+        query_keys = keys[start:end].unsqueeze(-1) + key_offsets
+        first = torch.searchsorted(sorted_keys, query_keys)
+        last = torch.searchsorted(sorted_keys, query_keys, right=True)
+
+        position = first.unsqueeze(-1) + slots
+        valid = (position < last.unsqueeze(-1)).view(end - start, -1)
+        candidates = order[position.clamp_max(total - 1)].view(end - start, -1)
+
+        distance = ((flat_points[candidates] - flat_points[start:end].unsqueeze(1))**2).sum(dim=-1)
+        if radius is not None:
+            valid = valid & (distance <= radius**2)
+        distance = distance.masked_fill(~valid, float('inf'))
+
+        distance, position = distance.topk(k=k, dim=-1, largest=False)
+        nearest = candidates.gather(-1, position)
+        if radius is not None:
+            query = torch.arange(start, end, device=x.device).unsqueeze(-1)
+            idx.append(torch.where(torch.isinf(distance), query, nearest))
+            continue
+
+        # Isolated points have fewer than k candidates around them, search their whole cloud
+        short = torch.isinf(distance[:, -1]).nonzero().view(-1)
+        if len(short) > 0:
+            query = short + start
+            offset = torch.div(query, num_points, rounding_mode='floor')*num_points
+            cloud = flat_points[offset.unsqueeze(-1) + torch.arange(num_points, device=x.device)]
+            dense = torch.cdist(flat_points[query].unsqueeze(1), cloud).squeeze(1)
+            nearest[short] = dense.topk(k=k, dim=-1, largest=False)[1] + offset.unsqueeze(-1)
+        idx.append(nearest)
+
+    idx = torch.cat(idx).view(batch_size, num_points, k)
+    return idx - torch.arange(batch_size, device=x.device).view(-1, 1, 1)*num_points
+
+def xyz_knn(x, k, backend='dense', tile_size=None, grid_radius=None, grid_min_points=4096, grid_max_per_cell=64, precision='fp32', rerank_margin=None):
+    ''' Neighbors of the first EdgeConv layer, whose input is the point coordinates. The
+    search runs in fp32 outside of autocast (bf16 knn_precision casts on its own). '''
+
+    if backend == 'auto':
+        backend = 'grid' if x.size(2) >= grid_min_points else 'dense'
+
+    with torch.autocast(x.device.type, enabled=False):
+        x = x.float()
+        if backend == 'dense':
+            return knn(x, k=k, tile_size=tile_size, precision=precision, rerank_margin=rerank_margin)
+        if backend == 'kdtree':
+            return kdtree_knn(x, k=k)
+        if backend == 'grid':
+            return grid_knn(x, k=k, radius=grid_radius, tile_size=tile_size, max_per_cell=grid_max_per_cell)
+    raise ValueError(f'Unknown xyz_knn_backend: {backend}')
+
+def lsh_knn(x, k, num_tables=4, window=None, num_bits=12, tile_size=None, seed=0):
+    ''' Approximate knn() for the feature-space layers: each point is only compared with the
+    `window` points around it in num_tables random-hyperplane hash orders. '''
+
+    x = x.detach()
+    batch_size, num_dims, num_points = x.size()
+    window = min(max(window or 2*k, k), num_points)
+    tile_size = tile_size or num_points
+
+    points = x.transpose(2, 1)
+    xx = torch.sum(x**2, dim=1)
+
+    generator = torch.Generator().manual_seed(seed)
+    planes = torch.randn(num_tables, num_dims, num_bits, generator=generator).to(x)
+    bit_values = 2**torch.arange(num_bits, device=x.device)
+    offsets = torch.arange(window, device=x.device)
+
+    best_distance = x.new_empty(batch_size, num_points, k)
+    best_idx = torch.empty(batch_size, num_points, k, dtype=torch.long, device=x.device)
+    for table in range(num_tables):
+        codes = ((torch.matmul(points, planes[table]) > 0).long()*bit_values).sum(dim=-1)
+        order = codes.argsort(dim=-1)
+        rank = order.argsort(dim=-1)
+        window_start = (rank - window//2).clamp(0, num_points - window)
+        position = (window_start.unsqueeze(-1) + offsets).view(batch_size, -1)
+        candidates = order.gather(1, position).view(batch_size, num_points, window)
+
+        for start in range(0, num_points, tile_size):
+            end = min(start + tile_size, num_points)
+            tile_candidates = candidates[:, start:end]
+            flat = tile_candidates.reshape(batch_size, -1)
+
+            neighbors = points.gather(1, flat.unsqueeze(-1).expand(-1, -1, num_dims)).view(batch_size, end - start, window, num_dims)
+            inner = torch.einsum('btc,btwc->btw', points[:, start:end], neighbors)
+            distance = 2*inner - xx[:, start:end].unsqueeze(-1) - xx.gather(1, flat).view(batch_size, end - start, window)
+
+            if table > 0:
+                # A neighbor found by several tables must be counted once
+                distance = torch.cat((best_distance[:, start:end], distance), dim=-1)
+                tile_candidates, order_by_idx = torch.cat((best_idx[:, start:end], tile_candidates), dim=-1).sort(dim=-1)
+                distance = distance.gather(-1, order_by_idx)
+                duplicate = torch.zeros_like(tile_candidates, dtype=torch.bool)
+                duplicate[..., 1:] = tile_candidates[..., 1:] == tile_candidates[..., :-1]
+                distance = distance.masked_fill(duplicate, float('-inf'))
+
+            distance, position = distance.topk(k=k, dim=-1)
+            best_distance[:, start:end] = distance
+            best_idx[:, start:end] = tile_candidates.gather(-1, position)
+
+    return best_idx
+
+def feature_knn(x, k, backend='dense', tile_size=None, lsh_tables=4, lsh_window=None, precision='fp32', rerank_margin=None):
+    ''' Neighbors of the EdgeConv layers that run on learned point features, searched in
+    fp32 outside of autocast like xyz_knn(). '''
+
+    with torch.autocast(x.device.type, enabled=False):
+        x = x.float()
+        if backend == 'dense':
+            return knn(x, k=k, tile_size=tile_size, precision=precision, rerank_margin=rerank_margin)
+        if backend == 'lsh':
+            return lsh_knn(x, k=k, num_tables=lsh_tables, window=lsh_window, tile_size=tile_size)
+    raise ValueError(f'Unknown feature_knn_backend: {backend}')
+
+def recompute_knn(args, layer):
+    ''' Whether EdgeConv `layer` builds its own graph or reuses the previous one (Params.knn_reuse). '''
+
+    if args.knn_reuse == 'none':
+        return True
+    if args.knn_reuse == 'xyz':
+        return layer == 0
+    if args.knn_reuse == 'group':
+        return layer % args.knn_reuse_group == 0
+    raise ValueError(f'Unknown knn_reuse: {args.knn_reuse}')
+
+def layer_knn(x, args, layer, idx=None, channels_last=False):
+    ''' Neighbors of EdgeConv `layer` (0 is the xyz input) with the backends configured in Params.
+    idx is the graph of the previous layer (or a precomputed xyz graph for layer 0) and is
+    returned as is when the layer does not recompute it. '''
+
+    if idx is not None and (layer == 0 or not recompute_knn(args, layer)):
+        return idx
+
+    if channels_last:
+        x = x.transpose(1, 2)
+    if layer == 0:
+        return xyz_knn(x, k=args.k, backend=args.xyz_knn_backend, tile_size=args.knn_tile_size,
+                       grid_radius=args.grid_radius, grid_min_points=args.grid_min_points, grid_max_per_cell=args.grid_max_per_cell,
+                       precision=args.knn_precision, rerank_margin=args.knn_rerank_margin)
+    return feature_knn(x, k=args.k, backend=args.feature_knn_backend, tile_size=args.knn_tile_size,
+                       lsh_tables=args.lsh_tables, lsh_window=args.lsh_window,
+                       precision=args.knn_precision, rerank_margin=args.knn_rerank_margin)
+
+def get_graph_feature(x, k=20, idx=None, tile_size=None):
     batch_size = x.size(0)
     num_points = x.size(2)
     x = x.view(batch_size, -1, num_points)
     if idx is None:
-        idx = knn(x, k=k)
-    device = torch.device('cuda')
+        idx = knn(x, k=k, tile_size=tile_size)
+    device = x.device
 
     idx_base = torch.arange(0, batch_size, device=device).view(-1, 1, 1)*num_points
 
@@ -54,3 +343,301 @@ def get_graph_feature(x, k=20, idx=None):
     feature = torch.cat((feature-x, x), dim=3).permute(0, 3, 1, 2).contiguous()
 
     return feature
+
+class EdgeGather(torch.autograd.Function):
+    ''' out[b, :, i, j] = neighbor[b, :, idx[b, i, j]] + center[b, :, i]. Only idx is
+    saved for backward, which scatters the gradient back onto the N point features. '''
+
+    @staticmethod
+    def forward(ctx, neighbor, center, idx):
+        ctx.save_for_backward(idx)
+        return gather_neighbors(neighbor, idx).add_(center.unsqueeze(-1))
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        idx, = ctx.saved_tensors
+        batch_size, num_dims, num_points, k = grad_output.size()
+
+        index = idx.reshape(batch_size, 1, num_points*k).expand(-1, num_dims, -1)
+        grad_neighbor = grad_output.new_zeros(batch_size, num_dims, num_points)
+        grad_neighbor.scatter_add_(2, index, grad_output.reshape(batch_size, num_dims, num_points*k))
+        grad_center = grad_output.sum(dim=-1)
+
+        return grad_neighbor, grad_center, None
+
+def edge_point_features(x, conv, channels_last=False):
+    ''' W·(x_j - x_i, x_i) = W_a·x_j + (W_b - W_a)·x_i for the 1x1 Conv2d conv: its neighbor
+    and center terms computed on the point features x, before any gather. '''
+    weight = conv.weight.view(conv.out_channels, -1)
+    num_dims = weight.size(1) // 2
+    w_neighbor, w_center = weight[:, :num_dims], weight[:, num_dims:] - weight[:, :num_dims]
+    if channels_last:
+        return F.linear(x, w_neighbor), F.linear(x, w_center, conv.bias)
+
+    neighbor = torch.matmul(w_neighbor, x)
+    center = torch.matmul(w_center, x)
+    if conv.bias is not None:
+        center = center + conv.bias.view(1, -1, 1)
+    return neighbor, center
+
+def decomposed_edge_conv(x, conv, k=20, idx=None, tile_size=None):
+    ''' conv(get_graph_feature(x)) for a 1x1 Conv2d without building the [B, 2C, N, k]
+    edge tensor, only the output of edge_point_features() is gathered over the neighbors. '''
+
+    batch_size = x.size(0)
+    num_points = x.size(2)
+    x = x.view(batch_size, -1, num_points)
+    if idx is None:
+        idx = knn(x, k=k, tile_size=tile_size)
+
+    neighbor, center = edge_point_features(x, conv)
+    if torch.is_grad_enabled() and (neighbor.requires_grad or center.requires_grad):
+        return EdgeGather.apply(neighbor, center, idx)
+    return gather_neighbors(neighbor, idx) + center.unsqueeze(-1)
+
+def gather_neighbors(x, idx):
+    ''' [B, C, N] point features and [B, N, k] neighbor indices to [B, C, N, k]. '''
+    batch_size, num_dims, num_points = x.size()
+    k = idx.size(-1)
+    index = idx.reshape(batch_size, 1, num_points*k).expand(-1, num_dims, -1)
+    return x.gather(2, index).view(batch_size, num_dims, num_points, k)
+
+def extreme_neighbors(x, idx, chunk_size=4, largest=True):
+    ''' Per channel and point, the index of the neighbor with the largest (or smallest)
+    feature, scanning chunk_size neighbors at a time. '''
+
+    num_dims = x.size(1)
+    best_value, best_idx = None, None
+    for start in range(0, idx.size(-1), chunk_size):
+        chunk = idx[:, :, start:start + chunk_size]
+        values = gather_neighbors(x, chunk)
+        value, position = values.max(dim=-1) if largest else values.min(dim=-1)
+        chunk_idx = chunk.unsqueeze(1).expand(-1, num_dims, -1, -1).gather(-1, position.unsqueeze(-1)).squeeze(-1)
+
+        if best_value is None:
+            best_value, best_idx = value, chunk_idx
+        else:
+            better = value > best_value if largest else value < best_value
+            best_value = torch.where(better, value, best_value)
+            best_idx = torch.where(better, chunk_idx, best_idx)
+
+    return best_idx
+
+def edge_batch_stats(neighbor, center, idx, chunk_size=4):
+    ''' Mean and biased variance over (B, N, k) of z[b, :, i, j] = neighbor[b, :, idx[b, i, j]] +
+    center[b, :, i], accumulated on the point features so that z is never built. '''
+
+    batch_size, num_dims, num_points = neighbor.size()
+    k = idx.size(-1)
+    count = batch_size*num_points*k
+    neighbor, center = neighbor.float(), center.float()
+
+    # Centering first keeps E[z^2] - E[z]^2 from cancelling
+    neighbor_shift = neighbor.detach().mean(dim=(0, 2), keepdim=True)
+    center_shift = center.detach().mean(dim=(0, 2), keepdim=True)
+    neighbor = neighbor - neighbor_shift
+    center = center - center_shift
+
+    flat_idx = idx.reshape(batch_size, -1)
+    occurrences = neighbor.new_zeros(batch_size, num_points).scatter_add_(1, flat_idx, neighbor.new_ones(flat_idx.size()))
+    occurrences = occurrences.unsqueeze(1)
+
+    neighbor_sum = torch.zeros_like(center)
+    for start in range(0, k, chunk_size):
+        neighbor_sum = neighbor_sum + gather_neighbors(neighbor, idx[:, :, start:start + chunk_size]).sum(dim=-1)
+
+    mean = ((occurrences*neighbor).sum(dim=(0, 2)) + k*center.sum(dim=(0, 2))) / count
+    square = ((occurrences*neighbor**2).sum(dim=(0, 2)) + 2*(center*neighbor_sum).sum(dim=(0, 2)) + k*(center**2).sum(dim=(0, 2))) / count
+    var = (square - mean**2).clamp_min(0)
+
+    return mean + (neighbor_shift + center_shift).view(-1), var
+
+def fused_edge_conv(x, conv, k=20, idx=None, tile_size=None, chunk_size=4):
+    ''' edge_conv() without the [B, C_out, N, k] activation: act(bn(z)) is monotonic per channel,
+    so its max over the neighbors is taken at the neighbor with the extreme z. '''
+
+    batch_size = x.size(0)
+    num_points = x.size(2)
+    x = x.view(batch_size, -1, num_points)
+    if idx is None:
+        idx = knn(x, k=k, tile_size=tile_size)
+
+    conv2d, bn, act = conv
+    folded = isinstance(bn, torch.nn.Identity) # BatchNorm folded into the conv by utils.bn_folding
+    neighbor, center = edge_point_features(x, conv2d)
+
+    with torch.no_grad():
+        selected = extreme_neighbors(neighbor, idx, chunk_size, largest=True)
+        if not folded and bn.affine and (bn.weight < 0).any():
+            smallest = extreme_neighbors(neighbor, idx, chunk_size, largest=False)
+            selected = torch.where((bn.weight < 0).view(1, -1, 1), smallest, selected)
+    x = neighbor.gather(2, selected) + center
+    if folded:
+        return act(x)
+
+    if bn.training or bn.running_mean is None:
+        mean, var = edge_batch_stats(neighbor, center, idx, chunk_size)
+        if bn.training and bn.track_running_stats:
+            with torch.no_grad():
+                bn.num_batches_tracked += 1
+                momentum = bn.momentum if bn.momentum is not None else 1.0 / float(bn.num_batches_tracked)
+                count = batch_size*num_points*idx.size(-1)
+                bn.running_mean.mul_(1 - momentum).add_(momentum*mean)
+                bn.running_var.mul_(1 - momentum).add_(momentum*var*count/(count - 1))
+    else:
+        mean, var = bn.running_mean, bn.running_var
+
+    x = (x - mean.view(1, -1, 1))*torch.rsqrt(var.view(1, -1, 1) + bn.eps)
+    if bn.affine:
+        x = x*bn.weight.view(1, -1, 1) + bn.bias.view(1, -1, 1)
+
+    return act(x)
+
+def checkpointed_blocks(args):
+    ''' Whether the (EdgeConv, attention) blocks run with activation checkpointing (Params.activation_checkpoint). '''
+
+    if args.activation_checkpoint not in ('none', 'edge_conv', 'all'):
+        raise ValueError(f'Unknown activation_checkpoint: {args.activation_checkpoint}')
+    return args.activation_checkpoint != 'none', args.activation_checkpoint == 'all'
+
+def checkpoint_block(fn, module, *inputs):
+    ''' fn(*inputs) with activation checkpointing, the BatchNorm running statistics of module are
+    only updated by the first pass. '''
+
+    if not torch.is_grad_enabled():
+        return fn(*inputs)
+
+    calls = []
+    def run(*inputs):
+        calls.append(None)
+        if len(calls) == 1:
+            return fn(*inputs)
+
+        batch_norms = [m for m in module.modules() if isinstance(m, torch.nn.modules.batchnorm._BatchNorm) and m.track_running_stats]
+        stats = [[buffer.clone() for buffer in (m.running_mean, m.running_var, m.num_batches_tracked)] for m in batch_norms]
+        # the non-reentrant checkpoint stops the recomputation early by raising
+        try:
+            return fn(*inputs)
+        finally:
+            with torch.no_grad():
+                for m, (running_mean, running_var, num_batches_tracked) in zip(batch_norms, stats):
+                    m.running_mean.copy_(running_mean)
+                    m.running_var.copy_(running_var)
+                    m.num_batches_tracked.copy_(num_batches_tracked)
+
+    return torch.utils.checkpoint.checkpoint(run, *inputs, use_reentrant=False)
+
+def edge_conv(x, conv, k=20, idx=None, tile_size=None, mode='dense', chunk_size=4, checkpoint=False, channels_last=False):
+    ''' EdgeConv block: conv is the Sequential(Conv2d, BatchNorm2d, activation) of the
+    DGCNN models, the result is max pooled over the k neighbors. With checkpoint the
+    k-expanded tensors of the block are recomputed during backward instead of stored. '''
+
+    if channels_last:
+        return edge_conv_channels_last(x, conv, idx, mode=mode, checkpoint=checkpoint)
+    if checkpoint:
+        return checkpoint_block(lambda x: edge_conv(x, conv, k=k, idx=idx, tile_size=tile_size, mode=mode, chunk_size=chunk_size), conv, x)
+
+    if mode == 'dense':
+        x = get_graph_feature(x, k=k, idx=idx, tile_size=tile_size)
+        x = conv(x)
+    elif mode == 'decomposed':
+        x = decomposed_edge_conv(x, conv[0], k=k, idx=idx, tile_size=tile_size)
+        x = conv[1:](x)
+    elif mode == 'fused':
+        return fused_edge_conv(x, conv, k=k, idx=idx, tile_size=tile_size, chunk_size=chunk_size)
+    else:
+        raise ValueError(f'Unknown edge_conv_mode: {mode}')
+
+    return x.max(dim=-1, keepdim=False)[0]
+
+def is_channels_last(args):
+    ''' Whether the model runs on channels-last [B, N, C] point features (Params.layout). '''
+
+    if args.layout not in ('channels_first', 'channels_last'):
+        raise ValueError(f'Unknown layout: {args.layout}')
+    return args.layout == 'channels_last'
+
+def pointwise_linear(layer, x):
+    ''' The 1x1 Conv1d/Conv2d `layer` on channels-last x [..., C_in] as a single GEMM. The
+    weight is only viewed, so checkpoints of both layouts are the same. '''
+    if isinstance(layer, torch.nn.Sequential): # factorized pair of utils.low_rank
+        for part in layer:
+            x = pointwise_linear(part, x)
+        return x
+    if hasattr(layer, 'linear'): # PointwiseLinear of utils.quantization
+        return layer.linear(x)
+    return F.linear(x, layer.weight.view(layer.out_channels, -1), layer.bias)
+
+def channels_last_norm(bn, x):
+    ''' BatchNorm1d/2d `bn` (or the nn.Identity left by bn folding) over the last axis of
+    channels-last x, with the same statistics as over the channel axis of channels-first x. '''
+    flat = x.reshape(-1, x.size(-1))
+    if isinstance(bn, torch.nn.BatchNorm2d):
+        flat = flat[..., None, None]
+    return bn(flat).view(x.shape)
+
+def pointwise_conv(layer, x, channels_last=False):
+    ''' The 1x1 conv `layer` on x in either layout. '''
+    return pointwise_linear(layer, x) if channels_last else layer(x)
+
+def point_norm(bn, x, channels_last=False):
+    ''' The BatchNorm `bn` of the point features x in either layout. '''
+    return channels_last_norm(bn, x) if channels_last else bn(x)
+
+def conv_norm(conv, bn, x, channels_last=False):
+    ''' bn(conv(x)) for the 1x1 conv and BatchNorm of the PointNet family in either layout. '''
+    return point_norm(bn, pointwise_conv(conv, x, channels_last), channels_last)
+
+def conv_block(conv, x, channels_last=False):
+    ''' Sequential(conv, bn, activation) of the DGCNN family on x in either layout. '''
+    if not channels_last:
+        return conv(x)
+    conv2d, bn, act = conv
+    return act(channels_last_norm(bn, pointwise_linear(conv2d, x)))
+
+def pool_points(x, reduce='max', channels_last=False):
+    ''' [B, C] max or mean of the point features x over the points. '''
+    if channels_last:
+        return x.max(dim=1)[0] if reduce == 'max' else x.mean(dim=1)
+    pool = F.adaptive_max_pool1d if reduce == 'max' else F.adaptive_avg_pool1d
+    return pool(x, 1).view(x.size(0), -1)
+
+def gather_rows(x, idx):
+    ''' Neighbor features [B, N, k, C] of channels-last x [B, N, C] and idx [B, N, k]. '''
+    batch_size, num_points, num_dims = x.size()
+    idx_base = torch.arange(batch_size, device=x.device).view(-1, 1, 1)*num_points
+    rows = x.reshape(batch_size*num_points, num_dims)[(idx + idx_base).view(-1)]
+    return rows.view(batch_size, num_points, idx.size(-1), num_dims)
+
+def get_graph_feature_channels_last(x, idx):
+    ''' get_graph_feature() for channels-last x: the [B, N, k, 2C] edge tensor is already in
+    the layout the GEMM of the conv wants, so it is neither permuted nor copied. '''
+    feature = gather_rows(x, idx)
+    x = x.unsqueeze(2).expand_as(feature)
+    return torch.cat((feature - x, x), dim=3)
+
+def edge_conv_channels_last(x, conv, idx, mode='dense', checkpoint=False):
+    ''' edge_conv() on channels-last [B, N, C] point features and the neighbors idx, returning
+    [B, N, C_out]. 'decomposed' runs the conv on the point features before gathering them;
+    'fused' needs the channels_first layout. '''
+
+    if checkpoint:
+        return checkpoint_block(lambda x: edge_conv_channels_last(x, conv, idx, mode=mode), conv, x)
+
+    if mode == 'dense':
+        x = conv_block(conv, get_graph_feature_channels_last(x, idx), channels_last=True)
+    elif mode == 'decomposed':
+        conv2d, bn, act = conv
+        neighbor, center = edge_point_features(x, conv2d, channels_last=True)
+        x = act(channels_last_norm(bn, gather_rows(neighbor, idx) + center.unsqueeze(2)))
+    else:
+        raise ValueError(f"edge_conv_mode '{mode}' is not available in the channels_last layout")
+
+    return x.max(dim=2, keepdim=False)[0]
+
+# utils.quantization.static_quantize traces the models with torch.fx: the neighbor searches
+# and the edge gather are recorded as single fp32 calls instead of being traced through
+torch.fx.wrap('xyz_knn')
+torch.fx.wrap('feature_knn')
+torch.fx.wrap('get_graph_feature')
+torch.fx.wrap('get_graph_feature_channels_last')